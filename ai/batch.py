@@ -0,0 +1,146 @@
+import argparse
+import concurrent.futures
+import contextlib
+import glob
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+
+from ai.parallel import resolve_worker_count
+
+# Default wall-clock budget of one database (loading, solving and saving), in seconds
+BATCH_TIME_LIMIT = 600.0
+# Solver logs of each database go to their own file here, so parallel solves do not interleave on the console
+BATCH_LOG_DIR = "batch_logs"
+
+
+def expand_databases(patterns):
+    """Database paths from paths and glob patterns, in the given order, without duplicates."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if os.path.abspath(path) not in map(os.path.abspath, paths):
+                paths.append(path)
+    return paths
+
+
+def _log_path(log_dir, db_path):
+    """One log file per database, named after its full path (campuses usually share the file name)."""
+    name = os.path.abspath(db_path).strip(os.sep).replace(os.sep, "_")
+    return os.path.join(log_dir, f"{name}.log")
+
+
+def solve_database(db_path, time_limit, seed=None, log_dir=BATCH_LOG_DIR):
+    """
+    Pool process entry point: solves one school database within time_limit seconds and saves the result as
+    its new current schedule version. Returns a summary dict; errors are reported in it, not raised.
+    """
+    started = time.perf_counter()
+    summary = {"database": db_path, "status": "failed", "version": None, "classes": 0, "hard": None, "soft": None,
+               "generations": 0, "stop_reason": None, "load_seconds": None, "solve_seconds": None,
+               "total_seconds": None, "log": None, "error": None}
+    try:
+        from ai.genetic_solver import solve_with_ga
+        from ai.utils import load_data, format_solution, save_schedule_to_db
+
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(db_path)
+        os.makedirs(log_dir, exist_ok=True)
+        summary['log'] = _log_path(log_dir, db_path)
+        with open(summary['log'], "w") as log, contextlib.redirect_stdout(log), \
+                sqlite3.connect(db_path, timeout=30) as conn:
+            teachers_df, classrooms_df, curriculum_df = load_data(conn)
+            summary['load_seconds'] = time.perf_counter() - started
+
+            # The solver stops at the first generation past its deadline; loading has used part of the budget
+            solve_started = time.perf_counter()
+            solution, run_info = solve_with_ga(teachers_df, classrooms_df, curriculum_df, return_info=True, seed=seed,
+                                               time_limit=max(1.0, time_limit - summary['load_seconds']))
+            summary['solve_seconds'] = time.perf_counter() - solve_started
+            summary['generations'] = run_info['generations']
+            summary['stop_reason'] = run_info['stop_reason']
+            if run_info['best_fitness'] is not None:
+                summary['hard'], summary['soft'] = run_info['best_fitness']
+
+            if solution:
+                schedule_df = format_solution(solution)
+                summary['version'] = save_schedule_to_db(conn, schedule_df)
+                summary['classes'] = len(schedule_df)
+                summary['status'] = "done"
+            else:
+                summary['error'] = "GA failed to find a solution."
+    except Exception as exc:
+        summary['error'] = repr(exc)
+    summary['total_seconds'] = time.perf_counter() - started
+    return summary
+
+
+def run_batch(db_paths, time_limit=BATCH_TIME_LIMIT, processes=None, seed=None, log_dir=BATCH_LOG_DIR):
+    """
+    Solves every database in a pool of spawned processes, one database per process at a time, and returns
+    their summaries in input order. Each pool process solves a single database and exits, so memory and
+    caches of one campus never carry over to the next.
+    """
+    processes = min(resolve_worker_count(processes), len(db_paths)) or 1
+    context = multiprocessing.get_context("spawn")
+    summaries = {}
+    with concurrent.futures.ProcessPoolExecutor(processes, mp_context=context, max_tasks_per_child=1) as pool:
+        futures = {pool.submit(solve_database, path, time_limit, seed, log_dir): path for path in db_paths}
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                summary = future.result()
+            except Exception as exc:
+                # The pool process itself died (e.g. killed for memory); the other databases keep going
+                summary = {"database": path, "status": "failed", "error": repr(exc)}
+            summaries[path] = summary
+            print(f"[{len(summaries)}/{len(db_paths)}] {path}: {summary['status']}"
+                  + (f" in {summary['total_seconds']:.1f}s" if summary.get('total_seconds') is not None else "")
+                  + (f" ({summary['error']})" if summary.get('error') else ""))
+    return [summaries[path] for path in db_paths]
+
+
+def print_summary(summaries, wall_seconds):
+    print(f"{'database':<40} {'status':<7} {'version':>7} {'classes':>7} {'hard':>5} {'soft':>7} "
+          f"{'gens':>5} {'stop':<15} {'solve s':>8} {'total s':>8}")
+    for s in summaries:
+        fmt = lambda v, spec="": "-" if v is None else format(v, spec)
+        print(f"{s['database'][-40:]:<40} {s['status']:<7} {fmt(s.get('version')):>7} {fmt(s.get('classes')):>7} "
+              f"{fmt(s.get('hard'), '.0f'):>5} {fmt(s.get('soft'), '.0f'):>7} {fmt(s.get('generations')):>5} "
+              f"{fmt(s.get('stop_reason')):<15} {fmt(s.get('solve_seconds'), '.1f'):>8} {fmt(s.get('total_seconds'), '.1f'):>8}")
+    busy = sum(s.get('total_seconds') or 0 for s in summaries)
+    done = sum(s['status'] == "done" for s in summaries)
+    print(f"{done}/{len(summaries)} databases solved in {wall_seconds:.1f}s wall clock "
+          f"({busy:.1f}s of solver processes, {busy / wall_seconds if wall_seconds else 0:.1f}x parallel).")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve many school databases in parallel and save each new schedule.")
+    parser.add_argument("databases", nargs="+", help="Database files or glob patterns, e.g. 'campuses/*/school_planner.db'.")
+    parser.add_argument("--time-limit", type=float, default=BATCH_TIME_LIMIT, help="Seconds per database.")
+    parser.add_argument("--processes", type=int, default=0, help="Databases solved at once (default: one per CPU core).")
+    parser.add_argument("--seed", type=int, help="Seed of every solve, for reproducible nightly runs.")
+    parser.add_argument("--log-dir", default=BATCH_LOG_DIR, help="Where the solver log of each database is written.")
+    parser.add_argument("--summary", help="Also write the summaries as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    db_paths = expand_databases(args.databases)
+    if not db_paths:
+        print("No databases matched.")
+        return 1
+    started = time.perf_counter()
+    summaries = run_batch(db_paths, args.time_limit, args.processes, args.seed, args.log_dir)
+    print_summary(summaries, time.perf_counter() - started)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summaries, f, indent=2)
+        print(f"Summary written to {args.summary}")
+    return 0 if all(s['status'] == "done" for s in summaries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
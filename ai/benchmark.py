@@ -0,0 +1,258 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Fixed, seeded datasets from the offline generator (scale 1 = 10 grades x 3 sections, 120 teachers, 50 rooms)
+BENCHMARK_CASES = {
+    "small": {"scale": 1, "seed": 1},
+    "medium": {"scale": 3, "seed": 2},
+    "large": {"scale": 10, "seed": 3},
+}
+# GA settings of every benchmark run; stagnation and target stops are off so each run does the same work
+BENCHMARK_GENERATIONS = 30
+BENCHMARK_POPULATION = 50
+BENCHMARK_SEED = 42
+# Relative change that counts as a regression in compare mode
+REGRESSION_THRESHOLD = 0.2
+# Seconds between checks that a case process is still alive while waiting for its metrics
+CASE_POLL_INTERVAL = 1.0
+
+# Metrics compared between runs: name -> True if higher is better
+COMPARED_METRICS = {
+    "phases.setup": False,
+    "phases.solve": False,
+    "generations_per_second": True,
+    "time_to_first_feasible": False,
+    "peak_rss_mb": False,
+}
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process and its finished children (ru_maxrss is KB on Linux, bytes on macOS)."""
+    unit = 1 if sys.platform == "darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * unit / (1024 * 1024)
+
+
+def _run_case(name, case, config, results):
+    """Benchmark process entry point: generates the dataset, solves it and reports the metrics of one case."""
+    try:
+        import ai.genetic_solver as genetic_solver
+        from ai.utils import load_data
+        from data.generate_data import generate_offline_dataset, write_offline_database
+
+        genetic_solver.N_GENERATIONS = config['generations']
+        genetic_solver.POPULATION_SIZE = config['population']
+        phases = {}
+        db_dir = tempfile.mkdtemp(prefix="school_planner_bench_")
+        try:
+            started = time.perf_counter()
+            frames = generate_offline_dataset(seed=case['seed'], scale=case['scale'])
+            db_path = os.path.join(db_dir, "school_planner.db")
+            write_offline_database(frames, db_path)
+            phases['generate_data'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            with sqlite3.connect(db_path) as conn:
+                teachers_df, classrooms_df, curriculum_df = load_data(conn)
+            phases['load_data'] = time.perf_counter() - started
+        finally:
+            shutil.rmtree(db_dir, ignore_errors=True)
+
+        started = time.perf_counter()
+        optimizer = genetic_solver.ScheduleOptimizer(teachers_df, classrooms_df, curriculum_df, seed=config['seed'],
+                                                     stagnation_limit=None, instrument=True, **config.get('solver', {}))
+        phases['setup'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        optimizer.run()
+        phases['solve'] = time.perf_counter() - started
+
+        info = optimizer.run_info
+        results.put((name, {
+            "dataset": {
+                "scale": case['scale'],
+                "seed": case['seed'],
+                "sections": len(frames['grade_sections']),
+                "teachers": len(frames['teachers']),
+                "classrooms": len(frames['classrooms']),
+                "class_hours": len(optimizer.class_slots),
+            },
+            "phases": phases,
+            # Breakdown of the solve phase from the solver's own timers
+            "solver_phases": info['phase_seconds'],
+            "repairs": info['repairs'],
+            "generations": info['generations'],
+            "generations_per_second": info['generations'] / phases['solve'] if phases['solve'] else None,
+            "time_to_first_feasible": info['first_feasible_seconds'],
+            "first_feasible_generation": info['first_feasible_generation'],
+            "best_fitness": list(info['best_fitness']),
+            "peak_rss_mb": _peak_rss_mb(),
+        }, None))
+    except Exception as exc:
+        results.put((name, None, repr(exc)))
+        raise
+
+
+def run_case(name, case, config):
+    """Runs one case in a fresh process, so imports, caches and peak RSS do not leak between cases."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_case, args=(name, case, config, results))
+    process.start()
+    while True:
+        try:
+            _, metrics, error = results.get(timeout=CASE_POLL_INTERVAL)
+            break
+        except queue.Empty:
+            if process.is_alive():
+                continue
+            # The metrics may have arrived just before the process exited
+            try:
+                _, metrics, error = results.get(timeout=CASE_POLL_INTERVAL)
+                break
+            except queue.Empty:
+                process.join()
+                raise RuntimeError(f"Benchmark case '{name}' process exited with code {process.exitcode} "
+                                   "without reporting (killed, e.g. out of memory, or crashed).")
+    process.join()
+    if metrics is None:
+        raise RuntimeError(f"Benchmark case '{name}' failed: {error}")
+    return metrics
+
+
+def _best_of(runs):
+    """Combines repeated runs of a case: fastest phase times and highest throughput, metrics of the fastest solve."""
+    best = dict(min(runs, key=lambda m: m['phases']['solve']))
+    best['phases'] = {phase: min(m['phases'][phase] for m in runs) for phase in best['phases']}
+    best['generations_per_second'] = max(m['generations_per_second'] or 0 for m in runs)
+    best['repeats'] = len(runs)
+    return best
+
+
+def run_suite(case_names=None, repeat=1, config=None):
+    """Runs the selected benchmark cases and returns the report dict that run mode writes as JSON."""
+    config = config or {'generations': BENCHMARK_GENERATIONS, 'population': BENCHMARK_POPULATION, 'seed': BENCHMARK_SEED}
+    case_names = case_names or list(BENCHMARK_CASES)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "cases": {},
+    }
+    for name in case_names:
+        if name not in BENCHMARK_CASES:
+            raise ValueError(f"Unknown benchmark case '{name}', expected one of {list(BENCHMARK_CASES)}")
+        print(f"--- Benchmark '{name}' ({BENCHMARK_CASES[name]}) ---")
+        runs = [run_case(name, BENCHMARK_CASES[name], config) for _ in range(max(1, repeat))]
+        report['cases'][name] = _best_of(runs)
+        metrics = report['cases'][name]
+        print(f"{name}: setup {metrics['phases']['setup']:.2f}s, solve {metrics['phases']['solve']:.2f}s, "
+              f"{metrics['generations_per_second']:.2f} gen/s, best {metrics['best_fitness']}, "
+              f"peak RSS {metrics['peak_rss_mb']:.0f} MB")
+    return report
+
+
+def _metric(metrics, path):
+    value = metrics
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare_reports(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Compares two reports case by case. A metric regresses if it got worse by more than `threshold`
+    (relative), or if the best hard-conflict count went up, or a baseline that reached a feasible
+    schedule no longer does. Returns a list of (case, metric, baseline, current, change, regressed).
+    """
+    rows = []
+    for name, base in baseline['cases'].items():
+        if name not in current['cases']:
+            continue
+        cur = current['cases'][name]
+        for path, higher_is_better in COMPARED_METRICS.items():
+            before, after = _metric(base, path), _metric(cur, path)
+            if before is None and after is None:
+                continue
+            if before is None or after is None:
+                # Only a lost first-feasible time is a regression, a newly found one is an improvement
+                rows.append((name, path, before, after, None, after is None))
+                continue
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            rows.append((name, path, before, after, change, worse > threshold))
+        hard_before, hard_after = base['best_fitness'][0], cur['best_fitness'][0]
+        rows.append((name, "best_hard", hard_before, hard_after, None, hard_after > hard_before))
+        soft_before, soft_after = base['best_fitness'][1], cur['best_fitness'][1]
+        change = (soft_after - soft_before) / soft_before if soft_before else 0.0
+        rows.append((name, "best_soft", soft_before, soft_after, change, hard_after == hard_before and change > threshold))
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'case':<8} {'metric':<24} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, path, before, after, change, regressed in rows:
+        fmt = lambda v: "-" if v is None else f"{v:.3f}" if isinstance(v, float) else str(v)
+        change_text = "" if change is None else f"{change:+.1%}"
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<8} {path:<24} {fmt(before):>12} {fmt(after):>12} {change_text:>9}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ScheduleOptimizer on seeded offline datasets.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run the suite and write a JSON report (e.g. a new baseline).")
+    run_parser.add_argument("--out", default="benchmark_results.json")
+
+    compare_parser = sub.add_parser("compare", help="Compare against a baseline; exits with 1 on regressions.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("--current", help="Existing report to compare instead of running the suite now.")
+    compare_parser.add_argument("--out", help="Where to write the report of the fresh run.")
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+
+    for p in (run_parser, compare_parser):
+        p.add_argument("--cases", help=f"Comma separated subset of {','.join(BENCHMARK_CASES)}.")
+        p.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest run is kept.")
+    args = parser.parse_args(argv)
+    case_names = args.cases.split(",") if args.cases else None
+
+    if args.command == "run":
+        report = run_suite(case_names, args.repeat)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Benchmark report written to {args.out}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        # Same cases and GA settings as the baseline, so the numbers are comparable
+        current = run_suite(case_names or list(baseline['cases']), args.repeat, baseline['config'])
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(current, f, indent=2)
+    rows = compare_reports(baseline, current, args.threshold)
+    print_comparison(rows)
+    regressions = [row for row in rows if row[-1]]
+    print(f"{len(regressions)} regression(s) above {args.threshold:.0%}." if regressions else "No regressions.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,246 @@
+import array
 import random
 import numpy as np
 from deap import base, creator, tools, algorithms
 from ai.utils import DAYS_OF_WEEK, TIME_SLOTS_PER_DAY
+from ai.parallel import ProblemPool, build_individual, resolve_worker_count, vary_offspring
+from ai.islands import run_islands
 import collections
+import time
 
 # --- GA Configuration ---
 POPULATION_SIZE = 200
 N_GENERATIONS = 150 # Increased generations for better convergence
 CXPB = 0.9
 MUTPB = 0.5
+# Chance that the mutation operator re-creates each mutable gene
+MUTATION_INDPB = 0.05
+# Island model defaults: migrate the best N_MIGRANTS individuals every MIGRATION_INTERVAL generations
+MIGRATION_INTERVAL = 10
+N_MIGRANTS = 5
+# Anytime stopping: give up after this many generations without a new best (hard, soft)
+STAGNATION_LIMIT = 50
+# Warm starts only re-plan a small neighbourhood and settle within a few generations
+WARM_STAGNATION_LIMIT = 10
+# Constructive initializer: randomized variants scale each slot's scarcity by up to (1 + NOISE)
+# and pick among the TOP_CHOICES least-contended free time cells
+CONSTRUCTIVE_NOISE = 0.5
+CONSTRUCTIVE_TOP_CHOICES = 3
+
+# Weekly time grid used by the vectorized evaluator: every (day, slot) pair is packed into one index.
+N_DAYS = len(DAYS_OF_WEEK)
+N_TIME_CELLS = N_DAYS * TIME_SLOTS_PER_DAY
+# Upper bound on the occupancy cells counted per chunk, keeps batch evaluation memory bounded on big schools.
+EVAL_CHUNK_CELLS = 1 << 22
+
+# Compact chromosome: every class slot is GENE_WIDTH int16 values in one flat buffer,
+# (teacher index, room index, packed time cell). Indices point into teacher_ids / classroom_ids.
+GENE_TYPECODE = 'h'
+GENE_WIDTH = 3
+GENE_MAX = 2 ** 15 - 1
+# Occupancy counters of ScheduleState; a cell never holds more bookings than there are genes,
+# so schools with more than GENE_MAX class hours use the wide counters
+OCC_TYPECODE = 'h'
+WIDE_OCC_TYPECODE = 'i'
+# Busy-time bitmasks of ScheduleState: bit t of an entity's mask is set while time cell t is booked
+MASK_TYPECODE = 'q'
+FULL_WEEK_MASK = (1 << N_TIME_CELLS) - 1
+# Repair intersects the masks with numpy once a slot has more candidate teachers + rooms than this
+VECTORIZE_CANDIDATES = 64
 
 # Multi-objective: 1st, heavily penalize hard conflicts. 2nd, minimize soft conflicts (gaps).
 creator.create("FitnessMulti", base.Fitness, weights=(-1000.0, -1.0))
-creator.create("Individual", list, fitness=creator.FitnessMulti)
+creator.create("Individual", array.array, typecode=GENE_TYPECODE, fitness=creator.FitnessMulti)
+
+def _set_bits(mask):
+    return [time for time in range(N_TIME_CELLS) if mask >> time & 1]
+
+
+class ScheduleState:
+    """
+    Occupancy counters of one individual (teacher/room/section x packed time cell), plus a
+    busy-time bitmask per teacher, room and section for the repair operator.
+    Kept in sync with the genes so hard and soft totals update per reassigned gene
+    instead of re-scoring the whole schedule.
+    """
+    __slots__ = ('teacher_occ', 'room_occ', 'section_occ', 'teacher_busy', 'room_busy', 'section_busy', 'hard', 'soft')
+
+    def __init__(self, teacher_occ, room_occ, section_occ, teacher_busy, room_busy, section_busy, hard, soft):
+        self.teacher_occ = teacher_occ
+        self.room_occ = room_occ
+        self.section_occ = section_occ
+        self.teacher_busy = teacher_busy
+        self.room_busy = room_busy
+        self.section_busy = section_busy
+        self.hard = hard
+        self.soft = soft
+
+    def copy(self):
+        return ScheduleState(self.teacher_occ[:], self.room_occ[:], self.section_occ[:],
+                             self.teacher_busy[:], self.room_busy[:], self.section_busy[:], self.hard, self.soft)
+
+    def in_conflict(self, cells):
+        teacher_cell, room_cell, section_cell = cells
+        return self.teacher_occ[teacher_cell] > 1 or self.room_occ[room_cell] > 1 or self.section_occ[section_cell] > 1
+
+    def _day_gap(self, teacher_cell):
+        """Idle periods of one teacher-day, counted exactly like evaluate_schedule."""
+        start = teacher_cell - teacher_cell % TIME_SLOTS_PER_DAY
+        day = self.teacher_occ[start:start + TIME_SLOTS_PER_DAY]
+        busy = [slot for slot, count in enumerate(day) if count]
+        if not busy:
+            return 0
+        return (busy[-1] - busy[0] + 1) - sum(day)
+
+    def _update(self, cells, delta):
+        teacher_cell, room_cell, section_cell = cells
+        self.soft -= self._day_gap(teacher_cell)
+        for occ, busy, cell in ((self.teacher_occ, self.teacher_busy, teacher_cell),
+                                (self.room_occ, self.room_busy, room_cell),
+                                (self.section_occ, self.section_busy, section_cell)):
+            entity, time = divmod(cell, N_TIME_CELLS)
+            if delta > 0:
+                if occ[cell] >= 1:
+                    self.hard += 1
+                else:
+                    busy[entity] |= 1 << time
+                occ[cell] += 1
+            else:
+                occ[cell] -= 1
+                if occ[cell] >= 1:
+                    self.hard -= 1
+                else:
+                    busy[entity] &= ~(1 << time)
+        self.soft += self._day_gap(teacher_cell)
+
+    def add(self, cells):
+        self._update(cells, 1)
+
+    def remove(self, cells):
+        self._update(cells, -1)
+
+    def move(self, old_cells, new_cells):
+        self.remove(old_cells)
+        self.add(new_cells)
+
+
+class StopCriteria:
+    """
+    Anytime stopping rules for the GA loop: a wall-clock deadline, a stagnation window
+    (generations without a new best) and a target (no hard conflicts, soft <= target_soft).
+    Also records when the first conflict-free schedule appeared.
+    """
+
+    def __init__(self, time_limit=None, stagnation_limit=None, target_soft=None, started=None):
+        self.started = started if started is not None else time.time()
+        self.deadline = self.started + time_limit if time_limit else None
+        self.stagnation_limit = stagnation_limit
+        self.target_soft = target_soft
+        self.best = None
+        self.last_improvement = 0
+        self.first_feasible_generation = None
+        self.first_feasible_seconds = None
+
+    def update(self, gen, pop):
+        """Records generation `gen` and returns the reason to stop now, or None to keep going."""
+        best = min(ind.fitness.values for ind in pop)
+        if self.best is None or best < self.best:
+            self.best, self.last_improvement = best, gen
+        if best[0] == 0 and self.first_feasible_generation is None:
+            self.first_feasible_generation = gen
+            self.first_feasible_seconds = time.time() - self.started
+
+        if self.target_soft is not None and self.best[0] == 0 and self.best[1] <= self.target_soft:
+            return "target"
+        if self.stagnation_limit and gen - self.last_improvement >= self.stagnation_limit:
+            return "stagnation"
+        if self.deadline is not None and time.time() >= self.deadline:
+            return "deadline"
+        return None
+
+    def summary(self, generations, stop_reason):
+        return {
+            "generations": generations,
+            "stop_reason": stop_reason,
+            "elapsed_seconds": time.time() - self.started,
+            "best_fitness": self.best,
+            "first_feasible_generation": self.first_feasible_generation,
+            "first_feasible_seconds": self.first_feasible_seconds,
+        }
+
+
+class PhaseTimer:
+    """
+    Wall time per GA phase (initialization, selection, clone, crossover, mutation, repair,
+    evaluation, hall_of_fame) and repair outcomes, per generation and in total. When disabled
+    only the repair counts are kept and the timing calls return immediately. With worker
+    processes, mutation and repair times are summed over workers.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.totals, self.generation = {}, {}
+        self.repairs = {"succeeded": 0, "failed": 0}
+        self.generation_repairs = dict(self.repairs)
+
+    def start(self):
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stop(self, phase, started):
+        if self.enabled:
+            self.add(phase, time.perf_counter() - started)
+
+    def add(self, phase, seconds):
+        self.generation[phase] = self.generation.get(phase, 0.0) + seconds
+
+    def record_repair(self, repaired):
+        """repaired: True/False for a repair that did/did not remove all hard conflicts, None if none was needed."""
+        if repaired is not None:
+            self.generation_repairs["succeeded" if repaired else "failed"] += 1
+
+    def end_generation(self):
+        """Folds the current generation into the totals and returns its record."""
+        record = {"phase_seconds": self.generation, "repairs": self.generation_repairs}
+        for phase, seconds in self.generation.items():
+            self.totals[phase] = self.totals.get(phase, 0.0) + seconds
+        for outcome, count in self.generation_repairs.items():
+            self.repairs[outcome] += count
+        self.generation, self.generation_repairs = {}, dict.fromkeys(self.repairs, 0)
+        return record
+
+    def summary(self):
+        return {"phase_seconds": dict(self.totals), "repairs": dict(self.repairs)}
+
 
 class ScheduleOptimizer:
-    def __init__(self, teachers_df, classrooms_df, curriculum_df):
+    def __init__(self, teachers_df, classrooms_df, curriculum_df, batch_evaluation=True, seed=None, n_workers=1,
+                 n_islands=1, migration_interval=MIGRATION_INTERVAL, n_migrants=N_MIGRANTS, migration_topology="ring",
+                 warm_start=None, time_limit=None, stagnation_limit=STAGNATION_LIMIT, target_soft=None,
+                 instrument=False, observer=None):
         print("--- Initializing Hybrid Genetic Algorithm Optimizer ---")
         self.teachers = teachers_df
         self.classrooms = classrooms_df
         self.curriculum = curriculum_df
+        self.batch_evaluation = batch_evaluation
+        # All GA randomness flows from this seed; workers get per-task seeds drawn from it,
+        # so a fixed seed gives the same schedule for any worker count.
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.n_workers = resolve_worker_count(n_workers)
+        # Island model: independent populations in separate processes exchanging migrants
+        self.n_islands = resolve_worker_count(n_islands)
+        self.migration_interval = migration_interval
+        self.n_migrants = n_migrants
+        self.migration_topology = migration_topology
+        # Anytime stopping (see StopCriteria); run_info describes the last run
+        self.time_limit = time_limit
+        self.stagnation_limit = stagnation_limit
+        self.target_soft = target_soft
+        self.run_info = {}
+        # Telemetry: per-phase timers (see PhaseTimer) and a callback receiving one record per generation.
+        # Islands run in other processes, so the observer only sees single-population runs.
+        self.instrument = instrument
+        self.observer = observer
         
         self.class_slots = []
         for _, row in curriculum_df.iterrows():
@@ -27,100 +248,551 @@ class ScheduleOptimizer:
                 self.class_slots.append((row['section_id'], row['subject_id'], i))
 
         self.valid_assignments_per_slot = self._precompute_valid_assignments()
+        self._build_index_encoding()
+        # Incremental re-solve: genes taken over from an existing schedule stay pinned,
+        # only self.mutable_slots are initialized, mutated and repaired.
+        self.warm_genes = None
+        self.mutable_slots = list(range(len(self.class_slots)))
+        if warm_start is not None:
+            self.warm_genes, self.mutable_slots = self._prepare_warm_start(warm_start)
         self.toolbox = base.Toolbox()
         self._setup_toolbox()
 
+    @classmethod
+    def from_problem_arrays(cls, arrays, batch_evaluation=True, seed=None):
+        """Rebuilds a single-process optimizer from problem_arrays() output, e.g. memory-mapped in a worker process."""
+        self = cls.__new__(cls)
+        self.teachers = self.classrooms = self.curriculum = None
+        self.batch_evaluation = batch_evaluation
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.n_workers = 1
+        self.n_islands = 1
+        self.time_limit = None
+        self.stagnation_limit = STAGNATION_LIMIT
+        self.target_soft = None
+        self.run_info = {}
+        self.instrument = False
+        self.observer = None
+        self.class_slots = arrays['class_slots']
+        # Slots with the same candidate ranges share one dict of views, like the per-course dicts of a fresh optimizer
+        shared = {}
+        self.valid_assignments_per_slot = []
+        for teachers, classrooms in zip(arrays['teacher_ranges'].tolist(), arrays['classroom_ranges'].tolist()):
+            key = (*teachers, *classrooms)
+            if key not in shared:
+                shared[key] = {'teachers': arrays['teacher_candidates'][teachers[0]:teachers[1]],
+                               'classrooms': arrays['classroom_candidates'][classrooms[0]:classrooms[1]]}
+            self.valid_assignments_per_slot.append(shared[key])
+        self.teacher_ids = arrays['teacher_ids']
+        self.classroom_ids = arrays['classroom_ids']
+        self.section_ids = arrays['section_ids']
+        self.slot_sections = arrays['slot_sections']
+        self._build_lookups()
+        self.warm_genes = [tuple(g) for g in arrays['warm_genes'].tolist()] if len(arrays['warm_genes']) else None
+        self.mutable_slots = arrays['mutable_slots'].tolist()
+        self.toolbox = base.Toolbox()
+        self._setup_toolbox()
+        return self
+
+    def problem_arrays(self):
+        """Static problem data as flat integer arrays that worker processes can map without pickling."""
+        def flatten(key):
+            # Each distinct candidate array is stored once; slots point at its (start, stop) range
+            ranges, chunks, seen, offset = [], [], {}, 0
+            for valid in self.valid_assignments_per_slot:
+                candidates = valid[key]
+                if id(candidates) not in seen:
+                    seen[id(candidates)] = (offset, offset + len(candidates))
+                    chunks.append(np.asarray(candidates, dtype=np.int64))
+                    offset += len(candidates)
+                ranges.append(seen[id(candidates)])
+            flat = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+            return np.array(ranges, dtype=np.int64).reshape(-1, 2), flat
+
+        teacher_ranges, teacher_candidates = flatten('teachers')
+        classroom_ranges, classroom_candidates = flatten('classrooms')
+        return {
+            'class_slots': np.array(self.class_slots, dtype=np.int64).reshape(len(self.class_slots), 3),
+            'teacher_ranges': teacher_ranges,
+            'teacher_candidates': teacher_candidates,
+            'classroom_ranges': classroom_ranges,
+            'classroom_candidates': classroom_candidates,
+            'teacher_ids': self.teacher_ids,
+            'classroom_ids': self.classroom_ids,
+            'section_ids': self.section_ids,
+            'slot_sections': self.slot_sections,
+            'warm_genes': np.array(self.warm_genes or [], dtype=np.int64).reshape(-1, GENE_WIDTH),
+            'mutable_slots': np.array(self.mutable_slots, dtype=np.int64),
+        }
+
+    def _prepare_warm_start(self, schedule_df):
+        """
+        Maps an existing schedule (rows of the `schedule` table) onto the class slots.
+        A gene stays pinned if its teacher and room are still valid for the slot and it does
+        not clash with another pinned gene. Everything else is re-optimized, together with its
+        conflict neighbourhood: the pinned genes a changed slot cannot avoid clashing with.
+        Returns (encoded warm genes, mutable slot indices).
+        """
+        hours = collections.defaultdict(list)
+        rows = schedule_df.sort_values(['section_id', 'subject_id', 'day_of_week', 'time_slot'])
+        for row in rows[['section_id', 'subject_id', 'teacher_id', 'classroom_id', 'day_of_week', 'time_slot']].itertuples(index=False):
+            hours[(row[0], row[1])].append(tuple(int(v) for v in row[2:]))
+
+        warm_genes = [None] * len(self.class_slots)
+        # (teacher / room / section, occupancy cell) -> pinned slot holding it
+        taken = {}
+        changed = set()
+        for i, (section_id, subject_id, hour) in enumerate(self.class_slots):
+            previous = hours.get((section_id, subject_id), [])
+            gene = previous[hour] if hour < len(previous) else None
+            valid = self.valid_assignments_per_slot[i]
+            if gene is None or gene[0] not in valid['teachers'] or gene[1] not in valid['classrooms'] \
+               or gene[2] not in DAYS_OF_WEEK or not 1 <= gene[3] <= TIME_SLOTS_PER_DAY:
+                changed.add(i)
+                continue
+            gene = self._encode_gene(gene)
+            cells = self._gene_cells(i, gene)
+            if any((kind, cell) in taken for kind, cell in enumerate(cells)):
+                changed.add(i)
+                continue
+            taken.update(((kind, cell), i) for kind, cell in enumerate(cells))
+            warm_genes[i] = gene
+
+        # Place the changed slots into the pinned schedule, most constrained first, the way repair would.
+        # A slot that finds no free placement lands on the fewest pinned bookings; those genes join it.
+        state = self._empty_state()
+        for i, gene in enumerate(warm_genes):
+            if gene is not None:
+                state.add(self._gene_cells(i, gene))
+        neighbours = set()
+        for i in sorted(changed, key=lambda i: (len(self._slot_choices[i][0]) * len(self._slot_choices[i][1]), i)):
+            # Placeholder only; mutable genes are re-created by the initializer
+            warm_genes[i] = self._free_placement(i, state, self.rng)
+            cells = self._gene_cells(i, warm_genes[i])
+            neighbours.update(taken[kind, cell] for kind, cell in enumerate(cells) if (kind, cell) in taken)
+            state.add(cells)
+
+        mutable = sorted(changed | neighbours)
+        print(f"Warm start: {len(changed)} class slots changed, re-optimizing {len(mutable)} "
+              f"and keeping {len(self.class_slots) - len(mutable)} pinned.")
+        return warm_genes, mutable
+
     def _precompute_valid_assignments(self):
+        """
+        Candidate teachers and rooms of every class slot. The lookups are grouped once
+        (subject -> teacher ids, room type -> room ids) and every weekly hour of a course
+        shares the same candidate arrays.
+        """
         print("Pre-computing valid resources for each class slot...")
+        empty = np.zeros(0, dtype=np.int64)
+        teachers_by_subject = {subject_id: ids.to_numpy(dtype=np.int64)
+                               for subject_id, ids in self.teachers.groupby('subject_id')['teacher_id']}
+        rooms_by_type = {type_id: ids.to_numpy(dtype=np.int64)
+                         for type_id, ids in self.classrooms.groupby('type_id')['classroom_id']}
+        required_types = self.curriculum.groupby(['section_id', 'subject_id'])['required_classroom_type_id'].first()
+
+        per_course = {}
         valid_assignments = []
         for section_id, subject_id, _ in self.class_slots:
-            qualified_teachers = self.teachers[self.teachers['subject_id'] == subject_id]['teacher_id'].tolist()
-            required_type_id = self.curriculum[(self.curriculum['section_id'] == section_id) & (self.curriculum['subject_id'] == subject_id)]['required_classroom_type_id'].iloc[0]
-            suitable_classrooms = self.classrooms[self.classrooms['type_id'] == required_type_id]['classroom_id'].tolist()
-            valid_assignments.append({'teachers': qualified_teachers, 'classrooms': suitable_classrooms})
+            course = (section_id, subject_id)
+            if course not in per_course:
+                per_course[course] = {'teachers': teachers_by_subject.get(subject_id, empty),
+                                      'classrooms': rooms_by_type.get(required_types[course], empty)}
+            valid_assignments.append(per_course[course])
         return valid_assignments
 
-    def _create_gene(self, slot_idx):
-        valid = self.valid_assignments_per_slot[slot_idx]
-        return (random.choice(valid['teachers']), random.choice(valid['classrooms']), 
-                random.choice(list(DAYS_OF_WEEK)), random.randint(1, TIME_SLOTS_PER_DAY))
+    def _build_index_encoding(self):
+        """Maps teacher, room and section ids to dense indices for the array-based evaluator."""
+        self.teacher_ids = np.unique(self.teachers['teacher_id'].to_numpy(dtype=np.int64))
+        self.classroom_ids = np.unique(self.classrooms['classroom_id'].to_numpy(dtype=np.int64))
+        self.section_ids = np.unique(np.array([s[0] for s in self.class_slots], dtype=np.int64))
+        self.slot_sections = np.searchsorted(self.section_ids, [s[0] for s in self.class_slots])
+        if max(len(self.teacher_ids), len(self.classroom_ids)) > GENE_MAX:
+            raise ValueError(f"Too many teachers or classrooms for the int16 gene encoding (max {GENE_MAX}).")
+        self._build_lookups()
+
+    def _build_lookups(self):
+        # Plain dicts/lists for encoding genes and for the per-gene bookkeeping of ScheduleState
+        self._teacher_pos = {t: i for i, t in enumerate(self.teacher_ids.tolist())}
+        self._classroom_pos = {r: i for i, r in enumerate(self.classroom_ids.tolist())}
+        self._slot_section_list = self.slot_sections.tolist()
+        self._occ_typecode = OCC_TYPECODE if len(self.class_slots) <= GENE_MAX else WIDE_OCC_TYPECODE
+        # Candidate teacher / room indices per class slot, the index-space view of valid_assignments_per_slot.
+        # Candidate arrays shared between slots (all teachers of a subject, all rooms of a type) are
+        # converted once and stay shared as lists.
+        converted = {}
+
+        def positions(ids, pos):
+            if id(ids) not in converted:
+                converted[id(ids)] = [pos[x] for x in np.asarray(ids).tolist()]
+            return converted[id(ids)]
+
+        self._slot_choices = [
+            (positions(valid['teachers'], self._teacher_pos), positions(valid['classrooms'], self._classroom_pos))
+            for valid in self.valid_assignments_per_slot
+        ]
+        self._candidate_groups = None
+
+    def _encode_gene(self, gene):
+        """(teacher_id, classroom_id, day, slot) -> (teacher index, room index, time cell)."""
+        teacher, room, day, slot = gene
+        return (self._teacher_pos[teacher], self._classroom_pos[room],
+                (day - DAYS_OF_WEEK.start) * TIME_SLOTS_PER_DAY + (slot - 1))
+
+    def _decode_gene(self, gene):
+        """(teacher index, room index, time cell) -> (teacher_id, classroom_id, day, slot)."""
+        teacher, room, time = gene
+        day, slot = divmod(time, TIME_SLOTS_PER_DAY)
+        return (int(self.teacher_ids[teacher]), int(self.classroom_ids[room]), day + DAYS_OF_WEEK.start, slot + 1)
+
+    @staticmethod
+    def _gene(individual, slot_idx):
+        j = slot_idx * GENE_WIDTH
+        return individual[j], individual[j + 1], individual[j + 2]
+
+    @staticmethod
+    def _from_bytes(genes):
+        individual = creator.Individual()
+        individual.frombytes(genes)
+        return individual
+
+    def _create_gene(self, slot_idx, rng=random):
+        teachers, classrooms = self._slot_choices[slot_idx]
+        return (teachers[rng.randrange(len(teachers))], classrooms[rng.randrange(len(classrooms))],
+                rng.randrange(N_TIME_CELLS))
     
-    def _greedy_initializer(self):
-        ind = creator.Individual([None] * len(self.class_slots))
-        teacher_schedule, room_schedule, section_schedule = {}, {}, {}
-        
-        for i in range(len(self.class_slots)):
-            section_id, _, _ = self.class_slots[i]
-            attempts = 0
-            while attempts < 50:
-                gene = self._create_gene(i)
-                teacher, room, day, slot = gene
-                if not teacher_schedule.get((teacher, day, slot)) and \
-                   not room_schedule.get((room, day, slot)) and \
-                   not section_schedule.get((section_id, day, slot)):
-                    ind[i] = gene
-                    teacher_schedule[(teacher, day, slot)] = True
-                    room_schedule[(room, day, slot)] = True
-                    section_schedule[(section_id, day, slot)] = True
-                    break
-                attempts += 1
-            if ind[i] is None:
-                ind[i] = self._create_gene(i)
+    def _empty_state(self):
+        """Occupancy state of a schedule with nothing booked yet."""
+        def zeros(typecode, n):
+            return array.array(typecode, [0]) * n
+
+        n_teachers, n_rooms, n_sections = len(self.teacher_ids), len(self.classroom_ids), len(self.section_ids)
+        occ = self._occ_typecode
+        return ScheduleState(zeros(occ, n_teachers * N_TIME_CELLS), zeros(occ, n_rooms * N_TIME_CELLS),
+                             zeros(occ, n_sections * N_TIME_CELLS), zeros(MASK_TYPECODE, n_teachers),
+                             zeros(MASK_TYPECODE, n_rooms), zeros(MASK_TYPECODE, n_sections), 0, 0)
+
+    @staticmethod
+    def _occupancy_views(state):
+        """Zero-copy (entity x time cell) numpy views of a state's teacher, room and section counters."""
+        return tuple(np.frombuffer(occ, dtype=np.dtype(occ.typecode)).reshape(-1, N_TIME_CELLS)
+                     for occ in (state.teacher_occ, state.room_occ, state.section_occ))
+
+    def _construction_groups(self):
+        """
+        Distinct candidate teacher and room lists (e.g. all teachers of a subject, all rooms of a type),
+        the group of each class slot and the groups each teacher and room belongs to. Built on first use.
+        """
+        if self._candidate_groups is None:
+            groups = []
+            for kind in range(2):
+                ids, members = {}, []
+                for choices in self._slot_choices:
+                    if id(choices[kind]) not in ids:
+                        ids[id(choices[kind])] = len(members)
+                        members.append(np.unique(choices[kind]))
+                n_entities = len(self.teacher_ids) if kind == 0 else len(self.classroom_ids)
+                member_of = [[] for _ in range(n_entities)]
+                for group, entities in enumerate(members):
+                    for entity in entities.tolist():
+                        member_of[entity].append(group)
+                groups.append(([ids[id(choices[kind])] for choices in self._slot_choices], members, member_of))
+            self._candidate_groups = groups
+        return self._candidate_groups
+
+    def _construction_order(self, rng=random, randomize=False):
+        """
+        Mutable class slots, most constrained first: fewest candidate teachers x rooms x free
+        section times. Randomized variants jitter the scarcity so near-ties come out in a different order.
+        """
+        section_hours = collections.Counter(self._slot_section_list)
+        scarcity = {}
+        for i in self.mutable_slots:
+            teachers, rooms = self._slot_choices[i]
+            free_times = N_TIME_CELLS - section_hours[self._slot_section_list[i]] + 1
+            scarcity[i] = len(teachers) * len(rooms) * max(free_times, 1)
+            if randomize:
+                scarcity[i] *= 1 + rng.random() * CONSTRUCTIVE_NOISE
+        return sorted(self.mutable_slots, key=lambda i: (scarcity[i], i))
+
+    def _constructive_initializer(self, rng=random, randomize=True):
+        """
+        Builds an individual slot by slot in most-constrained-first order (pinned warm-start genes first).
+        Each slot goes to the least-contended free cell: the free section time where the most of its
+        candidate teachers and rooms are still free, then the least loaded free teacher and room there.
+        Randomized variants pick among the CONSTRUCTIVE_TOP_CHOICES best cells.
+        """
+        ind = creator.Individual(array.array(GENE_TYPECODE, [0]) * (len(self.class_slots) * GENE_WIDTH))
+        state = self._empty_state()
+        teacher_occ, room_occ, section_occ = self._occupancy_views(state)
+        (teacher_group_of, teacher_groups, teacher_member_of), (room_group_of, room_groups, room_member_of) = \
+            self._construction_groups()
+        # Free members of every candidate group per time cell, and booked cells per teacher / room
+        free_teachers = np.array([[len(g)] * N_TIME_CELLS for g in teacher_groups], dtype=np.int64)
+        free_rooms = np.array([[len(g)] * N_TIME_CELLS for g in room_groups], dtype=np.int64)
+        teacher_load = np.zeros(len(self.teacher_ids), dtype=np.int64)
+        room_load = np.zeros(len(self.classroom_ids), dtype=np.int64)
+        busy_load = len(self.class_slots) + 1
+
+        def least_loaded_free(members, occ, load, time):
+            return int(members[np.where(occ[members, time] == 0, load[members], busy_load).argmin()])
+
+        def book(i, gene):
+            teacher, room, time = gene
+            cells = self._gene_cells(i, gene)
+            if not state.teacher_occ[cells[0]]:
+                for group in teacher_member_of[teacher]:
+                    free_teachers[group, time] -= 1
+                teacher_load[teacher] += 1
+            if not state.room_occ[cells[1]]:
+                for group in room_member_of[room]:
+                    free_rooms[group, time] -= 1
+                room_load[room] += 1
+            state.add(cells)
+            self._set_gene(ind, i, gene)
+
+        if self.warm_genes is not None:
+            mutable = set(self.mutable_slots)
+            for i, gene in enumerate(self.warm_genes):
+                if i not in mutable:
+                    book(i, gene)
+
+        for i in self._construction_order(rng, randomize):
+            contention = free_teachers[teacher_group_of[i]] * free_rooms[room_group_of[i]] \
+                * (section_occ[self._slot_section_list[i]] == 0)
+            if not contention.any():
+                book(i, self._least_conflicting_placement(i, state, rng))
+                continue
+            if randomize:
+                top = np.argpartition(-contention, CONSTRUCTIVE_TOP_CHOICES)[:CONSTRUCTIVE_TOP_CHOICES]
+                top = top[contention[top] > 0]
+                time = int(top[rng.randrange(len(top))])
+            else:
+                time = int(contention.argmax())
+
+            teacher = least_loaded_free(teacher_groups[teacher_group_of[i]], teacher_occ, teacher_load, time)
+            room = least_loaded_free(room_groups[room_group_of[i]], room_occ, room_load, time)
+            book(i, (teacher, room, time))
         return ind
 
-    def _repair_schedule(self, individual):
+    def _build_individual(self, task):
+        """Constructed individual from (seed, randomize), as raw gene bytes that are cheap to send between processes."""
+        seed, randomize = task
+        return self.toolbox.individual(random.Random(seed), randomize).tobytes()
+
+    def _vary_task(self, task):
+        """
+        Mutates (if selected) and repairs one offspring: (gene bytes, state, mutate, seed, timed) ->
+        (gene bytes, state, (mutation seconds, repair seconds, repaired)); see PhaseTimer.record_repair.
+        """
+        genes, state, mutate, seed, timed = task
+        individual = self._from_bytes(genes)
+        individual.state = state
+        rng = random.Random(seed)
+        timer = PhaseTimer(timed)
+        started = timer.start()
+        if mutate:
+            self.toolbox.mutate(individual, rng=rng)
+        mutated = timer.start()
+        needs_repair = state.hard > 0
+        self._repair_schedule(individual, rng)
+        repaired = timer.start()
+        timing = (mutated - started, repaired - mutated, state.hard == 0 if needs_repair else None)
+        return individual.tobytes(), individual.state, timing
+
+    def _initial_population(self, n, pool=None, deadline=None):
+        """
+        One deterministic most-constrained-first schedule, the rest randomized variants of it. With a
+        deadline, individuals are built one per worker at a time; once it passes, construction stops and
+        the rest of the population are mutated copies of the individuals built so far.
+        """
+        tasks = [(self.rng.getrandbits(64), k > 0) for k in range(n)]
+        build = (lambda batch: pool.map(build_individual, batch)) if pool is not None else \
+            (lambda batch: map(self._build_individual, batch))
+        if deadline is None:
+            return [self._from_bytes(g) for g in build(tasks)]
+
+        step = pool.n_workers if pool is not None else 1
+        population = []
+        for start in range(0, n, step):
+            if population and time.time() >= deadline:
+                break
+            population.extend(self._from_bytes(g) for g in build(tasks[start:start + step]))
+        if len(population) < n:
+            print(f"GA: Deadline reached after building {len(population)} of {n} individuals, "
+                  f"filling the population with mutated copies.")
+            population += [self._mutated_copy(population[k % len(population)]) for k in range(n - len(population))]
+        return population
+
+    def _mutated_copy(self, individual):
+        """Copy of a freshly built individual (no state yet) with each mutable gene re-created at MUTATION_INDPB."""
+        copy = self._from_bytes(individual.tobytes())
+        for i in self.mutable_slots:
+            if self.rng.random() < MUTATION_INDPB:
+                self._set_gene(copy, i, self._create_gene(i, self.rng))
+        return copy
+
+    def _gene_cells(self, slot_idx, gene):
+        """Teacher, room and section occupancy cells a gene books."""
+        teacher, room, time = gene
+        return (teacher * N_TIME_CELLS + time,
+                room * N_TIME_CELLS + time,
+                self._slot_section_list[slot_idx] * N_TIME_CELLS + time)
+
+    @staticmethod
+    def _set_gene(individual, slot_idx, gene):
+        j = slot_idx * GENE_WIDTH
+        individual[j], individual[j + 1], individual[j + 2] = gene
+
+    def _reassign(self, individual, slot_idx, gene):
+        """Replaces one gene and applies the delta to the individual's conflict counters."""
+        individual.state.move(self._gene_cells(slot_idx, self._gene(individual, slot_idx)), self._gene_cells(slot_idx, gene))
+        self._set_gene(individual, slot_idx, gene)
+
+    def _attach_states(self, individuals):
+        """Builds the occupancy state of each individual from the batch occupancy counts."""
+        bit_values = np.left_shift(1, np.arange(N_TIME_CELLS, dtype=np.int64))
+
+        def counters(occ):
+            buffer = array.array(self._occ_typecode)
+            buffer.frombytes(occ.astype(np.dtype(self._occ_typecode), copy=False).tobytes())
+            return buffer
+
+        def masks(occ):
+            buffer = array.array(MASK_TYPECODE)
+            buffer.frombytes(((occ > 0) @ bit_values).astype(np.dtype(MASK_TYPECODE), copy=False).tobytes())
+            return buffer
+
+        for start, teacher_occ, room_occ, section_occ, hard, soft in self._iter_occupancy(individuals):
+            for k in range(teacher_occ.shape[0]):
+                individuals[start + k].state = ScheduleState(
+                    counters(teacher_occ[k]), counters(room_occ[k]), counters(section_occ[k]),
+                    masks(teacher_occ[k]), masks(room_occ[k]), masks(section_occ[k]), int(hard[k]), int(soft[k]))
+
+    def _clone(self, individual):
+        """Copies the gene buffer, fitness and occupancy state; no per-gene objects are created."""
+        clone = creator.Individual(individual)
+        if individual.fitness.valid:
+            clone.fitness.values = individual.fitness.values
+        clone.state = individual.state.copy()
+        return clone
+
+    def _mate(self, ind1, ind2, rng=random):
+        """
+        Two-point crossover (same cut points as tools.cxTwoPoint) that swaps the genes as two buffer
+        slices. The occupancy states are left stale: a cut swaps about a third of the chromosome, so
+        _evolve_generation rebuilds the states of all crossed offspring in one _attach_states batch.
+        """
+        size = min(len(ind1), len(ind2)) // GENE_WIDTH
+        cxpoint1 = rng.randint(1, size)
+        cxpoint2 = rng.randint(1, size - 1)
+        if cxpoint2 >= cxpoint1:
+            cxpoint2 += 1
+        else:
+            cxpoint1, cxpoint2 = cxpoint2, cxpoint1
+        lo, hi = cxpoint1 * GENE_WIDTH, cxpoint2 * GENE_WIDTH
+        ind1[lo:hi], ind2[lo:hi] = ind2[lo:hi], ind1[lo:hi]
+        return ind1, ind2
+
+    def _free_placement(self, slot_idx, state, rng=random):
+        """
+        Picks a conflict-free (teacher, room, time) for a slot directly from the busy masks:
+        the section's free cells, intersected with the free cells of any candidate room and then
+        of each candidate teacher. Falls back to the least-conflicting placement if none is free.
+        """
+        teachers, rooms = self._slot_choices[slot_idx]
+        section_free = ~state.section_busy[self._slot_section_list[slot_idx]] & FULL_WEEK_MASK
+        if len(teachers) + len(rooms) > VECTORIZE_CANDIDATES:
+            return self._free_placement_vectorized(slot_idx, state, section_free, rng)
+        room_free = 0
+        for room in rooms:
+            room_free |= ~state.room_busy[room]
+        room_free &= section_free
+
+        open_teachers = []
+        for teacher in teachers:
+            mask = room_free & ~state.teacher_busy[teacher]
+            if mask:
+                open_teachers.append((teacher, mask))
+        if not open_teachers:
+            return self._least_conflicting_placement(slot_idx, state, rng)
+
+        teacher, mask = open_teachers[rng.randrange(len(open_teachers))]
+        times = _set_bits(mask)
+        time = times[rng.randrange(len(times))]
+        open_rooms = [room for room in rooms if not state.room_busy[room] >> time & 1]
+        return teacher, open_rooms[rng.randrange(len(open_rooms))], time
+
+    def _free_placement_vectorized(self, slot_idx, state, section_free, rng=random):
+        """_free_placement for long candidate lists (big schools), on numpy views of the busy masks."""
+        teachers, rooms = self._slot_choices[slot_idx]
+        mask_dtype = np.dtype(MASK_TYPECODE)
+        room_busy = np.frombuffer(state.room_busy, dtype=mask_dtype)[rooms]
+        room_free = int(np.bitwise_or.reduce(~room_busy)) & section_free
+        teacher_masks = room_free & ~np.frombuffer(state.teacher_busy, dtype=mask_dtype)[teachers]
+        open_teachers = np.flatnonzero(teacher_masks)
+        if not len(open_teachers):
+            return self._least_conflicting_placement(slot_idx, state, rng)
+
+        k = int(open_teachers[rng.randrange(len(open_teachers))])
+        times = _set_bits(int(teacher_masks[k]))
+        time = times[rng.randrange(len(times))]
+        open_rooms = np.flatnonzero((room_busy >> time) & 1 == 0)
+        return teachers[k], rooms[int(open_rooms[rng.randrange(len(open_rooms))])], time
+
+    def _least_conflicting_placement(self, slot_idx, state, rng=random):
+        """Placement that adds the fewest bookings to already occupied cells (ties broken at random)."""
+        teachers, rooms = self._slot_choices[slot_idx]
+        teacher_occ, room_occ, section_occ = self._occupancy_views(state)
+        teacher_occ, room_occ = teacher_occ[teachers], room_occ[rooms]
+        section_occ = section_occ[self._slot_section_list[slot_idx]]
+
+        cost = section_occ + teacher_occ.min(axis=0) + room_occ.min(axis=0)
+        best_times = np.flatnonzero(cost == cost.min())
+        time = int(best_times[rng.randrange(len(best_times))])
+        return teachers[int(teacher_occ[:, time].argmin())], rooms[int(room_occ[:, time].argmin())], time
+
+    def _repair_schedule(self, individual, rng=random):
+        state = individual.state
         max_repair_cycles = 5
         for _ in range(max_repair_cycles):
-            conflicts_found = False
-            teacher_slots, room_slots, section_slots = collections.defaultdict(list), collections.defaultdict(list), collections.defaultdict(list)
-            
-            for i, gene in enumerate(individual):
-                teacher, room, day, slot = gene
-                section = self.class_slots[i][0]
-                teacher_slots[(teacher, day, slot)].append(i)
-                room_slots[(room, day, slot)].append(i)
-                section_slots[(section, day, slot)].append(i)
-            
-            all_conflicts = set()
-            for slot_group in [teacher_slots, room_slots, section_slots]:
-                for indices in slot_group.values():
-                    if len(indices) > 1:
-                        conflicts_found = True
-                        for i in indices[1:]: all_conflicts.add(i)
-
-            if not conflicts_found:
+            if state.hard == 0:
                 break # No more hard conflicts, repair is done
 
+            conflicting = [i for i in self.mutable_slots if state.in_conflict(self._gene_cells(i, self._gene(individual, i)))]
+
             # Attempt to repair only the identified conflicting genes
-            for i in list(all_conflicts):
-                for _ in range(20):
-                    new_gene = self._create_gene(i)
-                    new_teacher, new_room, new_day, new_slot = new_gene
-                    
-                    # Check against the *current* state of the schedule
-                    if len(teacher_slots.get((new_teacher, new_day, new_slot), [])) == 0 and \
-                       len(room_slots.get((new_room, new_day, new_slot), [])) == 0 and \
-                       len(section_slots.get((self.class_slots[i][0], new_day, new_slot), [])) == 0:
-                        individual[i] = new_gene
-                        break
+            for i in conflicting:
+                cells = self._gene_cells(i, self._gene(individual, i))
+                # An earlier move in this pass may already have resolved this gene
+                if not state.in_conflict(cells):
+                    continue
+                # Lift the gene out of the schedule and put it back where the masks say it fits
+                state.remove(cells)
+                new_gene = self._free_placement(i, state, rng)
+                state.add(self._gene_cells(i, new_gene))
+                self._set_gene(individual, i, new_gene)
         return individual
 
     def _setup_toolbox(self):
-        self.toolbox.register("individual", self._greedy_initializer)
+        self.toolbox.register("individual", self._constructive_initializer)
         self.toolbox.register("population", tools.initRepeat, list, self.toolbox.individual)
         self.toolbox.register("evaluate", self.evaluate_schedule)
+        self.toolbox.register("evaluate_population", self.evaluate_population)
         self.toolbox.register("select", tools.selNSGA2)
-        self.toolbox.register("mate", tools.cxTwoPoint)
+        self.toolbox.register("clone", self._clone)
+        self.toolbox.register("mate", self._mate)
         
         # --- THE DEFINITIVE FIX: A CUSTOM MUTATION OPERATOR ---
-        def custom_mutate(individual, indpb):
+        def custom_mutate(individual, indpb, rng=random):
             """Mutates a gene by re-generating a valid assignment for its position."""
-            for i in range(len(individual)):
-                if random.random() < indpb:
-                    individual[i] = self._create_gene(i) # This respects the constraints of the class slot
+            for i in self.mutable_slots:
+                if rng.random() < indpb:
+                    self._reassign(individual, i, self._create_gene(i, rng)) # This respects the constraints of the class slot
             return individual,
         
-        self.toolbox.register("mutate", custom_mutate, indpb=0.05)
+        self.toolbox.register("mutate", custom_mutate, indpb=MUTATION_INDPB)
         # --- END FIX ---
 
     def evaluate_schedule(self, individual):
@@ -128,8 +800,8 @@ class ScheduleOptimizer:
         teacher_slots, room_slots, section_slots = collections.defaultdict(int), collections.defaultdict(int), collections.defaultdict(int)
         teacher_daily_slots = collections.defaultdict(list)
 
-        for i, gene in enumerate(individual):
-            teacher, room, day, slot = gene
+        for i in range(len(self.class_slots)):
+            teacher, room, day, slot = self._decode_gene(self._gene(individual, i))
             section = self.class_slots[i][0]
             teacher_slots[(teacher, day, slot)] += 1
             room_slots[(room, day, slot)] += 1
@@ -146,60 +818,226 @@ class ScheduleOptimizer:
                 
         return hard_conflicts, soft_conflicts
 
+    def _population_matrix(self, population):
+        """Views individuals as (individuals x class slots) index matrices: teacher, room and packed time."""
+        buffer = b"".join(ind.tobytes() for ind in population)
+        genes = np.frombuffer(buffer, dtype=np.dtype(GENE_TYPECODE)).reshape(len(population), len(self.class_slots), GENE_WIDTH)
+        genes = genes.astype(np.int64)
+        return genes[:, :, 0], genes[:, :, 1], genes[:, :, 2]
+
+    @staticmethod
+    def _occupancy(entities, times, n_entities):
+        """Counts bookings per (individual, entity, time cell) with a single bincount."""
+        n_pop = entities.shape[0]
+        offsets = (np.arange(n_pop)[:, None] * n_entities + entities) * N_TIME_CELLS + times
+        counts = np.bincount(offsets.ravel(), minlength=n_pop * n_entities * N_TIME_CELLS)
+        return counts.reshape(n_pop, n_entities, N_TIME_CELLS)
+
+    def _iter_occupancy(self, population):
+        """Yields (chunk start, teacher/room/section occupancy, hard, soft) for chunks of the population."""
+        n_genes = len(self.class_slots)
+        widest = max(len(self.teacher_ids), len(self.classroom_ids), len(self.section_ids))
+        chunk = max(1, EVAL_CHUNK_CELLS // (widest * N_TIME_CELLS))
+        for start in range(0, len(population), chunk):
+            teachers, rooms, times = self._population_matrix(population[start:start + chunk])
+            sections = np.broadcast_to(self.slot_sections, teachers.shape)
+
+            teacher_occ = self._occupancy(teachers, times, len(self.teacher_ids))
+            room_occ = self._occupancy(rooms, times, len(self.classroom_ids))
+            section_occ = self._occupancy(sections, times, len(self.section_ids))
+
+            # Every booking beyond the first in a cell is one conflict: genes - occupied cells.
+            hard = 3 * n_genes - sum(np.count_nonzero(occ, axis=(1, 2)) for occ in (teacher_occ, room_occ, section_occ))
+
+            # Teacher idle gaps: span between first and last busy slot of each day minus classes taught that day.
+            daily = teacher_occ.reshape(teacher_occ.shape[0], teacher_occ.shape[1], N_DAYS, TIME_SLOTS_PER_DAY)
+            busy = daily > 0
+            first = busy.argmax(axis=3)
+            last = TIME_SLOTS_PER_DAY - 1 - busy[..., ::-1].argmax(axis=3)
+            gaps = np.where(busy.any(axis=3), last - first + 1 - daily.sum(axis=3), 0)
+            soft = gaps.sum(axis=(1, 2))
+
+            yield start, teacher_occ, room_occ, section_occ, hard, soft
+
+    def evaluate_population(self, population):
+        """Scores a whole population at once. Returns the same (hard, soft) tuples as evaluate_schedule."""
+        results = []
+        for _, _, _, _, hard, soft in self._iter_occupancy(population):
+            results.extend(zip(hard.tolist(), soft.tolist()))
+        return results
+
+    def _evaluate_individuals(self, individuals):
+        """Assigns fitness to the given individuals, in batch mode or one by one."""
+        if self.batch_evaluation:
+            fitnesses = self.toolbox.evaluate_population(individuals)
+        else:
+            fitnesses = self.toolbox.map(self.toolbox.evaluate, individuals)
+        for ind, fit in zip(individuals, fitnesses):
+            ind.fitness.values = fit
+
     def run(self):
-        pop = self.toolbox.population(n=POPULATION_SIZE)
-        hof = tools.ParetoFront()
+        if self.warm_genes is not None and not self.mutable_slots:
+            return self._keep_warm_start()
+        if self.n_islands > 1:
+            print(f"GA: Island mode with {self.n_islands} islands ({self.migration_topology} topology, "
+                  f"{self.n_migrants} migrants every {self.migration_interval} generations).")
+            hof, finalists, self.run_info = run_islands(self)
+            return self._finish(hof, finalists)
+        if self.n_workers > 1:
+            print(f"GA: Using a pool of {self.n_workers} worker processes.")
+            with ProblemPool(self, self.n_workers) as pool:
+                return self._run(pool)
+        return self._run(None)
+
+    def _keep_warm_start(self):
+        """Nothing changed since the warm-start schedule: returns it as is instead of evolving identical copies."""
+        criteria = self._stop_criteria()
+        ind = creator.Individual(array.array(GENE_TYPECODE, [v for gene in self.warm_genes for v in gene]))
+        ind.fitness.values = self.toolbox.evaluate(ind)
+        criteria.update(0, [ind])
+        self.run_info = {**criteria.summary(0, "unchanged"), **self._phase_timer().summary()}
+        print("GA: Warm start unchanged, keeping the current schedule.")
+        return self._finish([ind], [ind])
+
+    def _stop_criteria(self, started=None):
+        return StopCriteria(self.time_limit, self.stagnation_limit, self.target_soft, started)
+
+    def _run(self, pool):
+        criteria = self._stop_criteria()
+        timer = self._phase_timer()
+        pop, hof = self._start_population(pool, timer, criteria.deadline)
+        stats = self._new_stats()
+        
+        # Begin the generational process; stop early on deadline, stagnation or target.
+        # Checked once before generation 1, so a deadline that passed during construction stops here.
+        gen = 0
+        stop_reason = criteria.update(gen, pop)
+        if self._observe(gen, stats.compile(pop), timer.end_generation(), criteria):
+            stop_reason = stop_reason or "cancelled"
+        while stop_reason is None and gen < N_GENERATIONS:
+            gen += 1
+            self._evolve_generation(pop, hof, pool, timer)
+            record = self._log_generation(stats, gen, pop)
+            stop_reason = criteria.update(gen, pop)
+            if self._observe(gen, record, timer.end_generation(), criteria):
+                stop_reason = stop_reason or "cancelled"
+
+        self.run_info = {**criteria.summary(gen, stop_reason or "max_generations"), **timer.summary()}
+        if stop_reason:
+            print(f"GA: Stopping after {gen} generations ({stop_reason}).")
+        return self._finish(hof, pop)
+
+    @staticmethod
+    def _new_stats():
         stats = tools.Statistics(lambda ind: ind.fitness.values)
         stats.register("avg", np.mean, axis=0)
         stats.register("min", np.min, axis=0)
+        return stats
+
+    @staticmethod
+    def _log_generation(stats, gen, pop, prefix=""):
+        record = stats.compile(pop)
+        print(f"{prefix}Gen {gen}: Min Fitness (Hard, Soft)={record['min']}, Avg Fitness={record['avg']}")
+        return record
+
+    def _phase_timer(self):
+        return PhaseTimer(self.instrument or self.observer is not None)
+
+    def _observe(self, gen, record, phases, criteria):
+        """
+        Hands one generation record (fitness, phase times, repair outcomes) to the observer, if any.
+        An observer returning True cancels the run; the best schedule so far is still returned.
+        """
+        if self.observer is None:
+            return False
+        return self.observer({
+            "generation": gen,
+            "elapsed_seconds": time.time() - criteria.started,
+            "min_fitness": record['min'].tolist(),
+            "avg_fitness": record['avg'].tolist(),
+            "best_fitness": criteria.best,
+            **phases,
+        })
+
+    def _start_population(self, pool=None, timer=None, deadline=None):
+        """
+        Builds and evaluates the initial population; returns it with a Pareto front hall of fame.
+        Construction stops early at the deadline (see _initial_population).
+        """
+        timer = timer or PhaseTimer(enabled=False)
+        started = timer.start()
+        pop = self._initial_population(POPULATION_SIZE, pool, deadline)
+        hof = tools.ParetoFront()
         
         print("GA: Starting evolution...")
         
         # Manually implement the evolutionary loop for more control
-        # 1. Evaluate the initial population
-        fitnesses = self.toolbox.map(self.toolbox.evaluate, pop)
-        for ind, fit in zip(pop, fitnesses):
-            ind.fitness.values = fit
+        # Evaluate the initial population
+        self._evaluate_individuals(pop)
+        self._attach_states(pop)
         
         hof.update(pop)
+        timer.stop("initialization", started)
+        return pop, hof
+
+    def _evolve_generation(self, pop, hof, pool=None, timer=None):
+        """Runs one generation in place: selection, crossover, mutation, repair and scoring."""
+        timer = timer or PhaseTimer(enabled=False)
+        # Select the next generation individuals
+        started = timer.start()
+        offspring = self.toolbox.select(pop, len(pop))
+        timer.stop("selection", started)
+        started = timer.start()
+        offspring = [self.toolbox.clone(ind) for ind in offspring]
+        timer.stop("clone", started)
+
+        # Apply crossover (done here with the master RNG), then rebuild the states of all crossed offspring at once
+        started = timer.start()
+        crossed = []
+        for i in range(1, len(offspring), 2):
+            if self.rng.random() < CXPB:
+                offspring[i-1], offspring[i] = self.toolbox.mate(offspring[i-1], offspring[i], rng=self.rng)
+                del offspring[i-1].fitness.values, offspring[i].fitness.values
+                crossed += offspring[i-1:i+1]
+        if crossed:
+            self._attach_states(crossed)
+        timer.stop("crossover", started)
         
-        # 2. Begin the generational process
-        for gen in range(1, N_GENERATIONS + 1):
-            # Select the next generation individuals
-            offspring = self.toolbox.select(pop, len(pop))
-            offspring = [self.toolbox.clone(ind) for ind in offspring]
-
-            # Apply crossover and mutation
-            for i in range(1, len(offspring), 2):
-                if random.random() < CXPB:
-                    offspring[i-1], offspring[i] = self.toolbox.mate(offspring[i-1], offspring[i])
-                    del offspring[i-1].fitness.values, offspring[i].fitness.values
-            
-            for i in range(len(offspring)):
-                if random.random() < MUTPB:
-                    offspring[i], = self.toolbox.mutate(offspring[i])
-                    del offspring[i].fitness.values
-            
-            # Repair each new offspring that was modified
-            for i in range(len(offspring)):
-                if not offspring[i].fitness.valid:
-                    offspring[i] = self._repair_schedule(offspring[i])
-
-            # Evaluate the individuals with an invalid fitness
-            invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
-            fitnesses = self.toolbox.map(self.toolbox.evaluate, invalid_ind)
-            for ind, fit in zip(invalid_ind, fitnesses):
-                ind.fitness.values = fit
-            
-            # Update the hall of fame with the new population
-            hof.update(offspring)
-            # Replace the old population with the new offspring
-            pop[:] = offspring
-            
-            # Log the stats
-            record = stats.compile(pop)
-            print(f"Gen {gen}: Min Fitness (Hard, Soft)={record['min']}, Avg Fitness={record['avg']}")
+        mutate = [self.rng.random() < MUTPB for _ in offspring]
+        for i in range(len(offspring)):
+            if mutate[i]:
+                del offspring[i].fitness.values
+        
+        # Mutate and repair each modified offspring, each from its own seed so the
+        # result does not depend on how the tasks are spread over workers
+        changed = [i for i in range(len(offspring)) if not offspring[i].fitness.valid]
+        tasks = [(offspring[i].tobytes(), offspring[i].state, mutate[i], self.rng.getrandbits(64), timer.enabled)
+                 for i in changed]
+        results = pool.map(vary_offspring, tasks) if pool is not None else map(self._vary_task, tasks)
+        for i, (genes, state, (mutation_seconds, repair_seconds, repaired)) in zip(changed, results):
+            offspring[i] = self._from_bytes(genes)
+            offspring[i].state = state
+            if timer.enabled:
+                timer.add("mutation", mutation_seconds)
+                timer.add("repair", repair_seconds)
+            timer.record_repair(repaired)
+
+        # Modified offspring are scored from their incrementally updated conflict counters
+        started = timer.start()
+        for ind in offspring:
+            if not ind.fitness.valid:
+                ind.fitness.values = (ind.state.hard, ind.state.soft)
+        timer.stop("evaluation", started)
+        
+        # Update the hall of fame with the new population
+        started = timer.start()
+        hof.update(offspring)
+        timer.stop("hall_of_fame", started)
+        # Replace the old population with the new offspring
+        pop[:] = offspring
 
+    def _finish(self, hof, pop):
+        """Picks the final schedule and converts it to the solution dict."""
         best_ind = None
         # Find the best solution with 0 hard conflicts from the Hall of Fame
         for ind in hof:
@@ -212,9 +1050,11 @@ class ScheduleOptimizer:
             best_ind = tools.selBest(pop, 1)[0]
             
         print(f"\nGA Finished. Best solution fitness: {best_ind.fitness.values}")
-        solution_dict = {self.class_slots[i]: best_ind[i] for i in range(len(self.class_slots))}
+        solution_dict = {self.class_slots[i]: self._decode_gene(self._gene(best_ind, i)) for i in range(len(self.class_slots))}
         return solution_dict
 
-def solve_with_ga(teachers_df, classrooms_df, curriculum_df):
-    optimizer = ScheduleOptimizer(teachers_df, classrooms_df, curriculum_df)
-    return optimizer.run()
\ No newline at end of file
+def solve_with_ga(teachers_df, classrooms_df, curriculum_df, return_info=False, **options):
+    """Runs the GA; with return_info=True returns (solution, run_info) so callers also get the run summary."""
+    optimizer = ScheduleOptimizer(teachers_df, classrooms_df, curriculum_df, **options)
+    solution = optimizer.run()
+    return (solution, optimizer.run_info) if return_info else solution
\ No newline at end of file
@@ -0,0 +1,220 @@
+import multiprocessing
+import queue
+import random
+import shutil
+import threading
+import time
+import traceback
+from deap import creator, tools
+from ai.parallel import load_problem_arrays, write_problem_arrays
+
+MIGRATION_TOPOLOGIES = ("ring", "random")
+# Seconds between checks that every island process is still alive while waiting for results
+ISLAND_POLL_INTERVAL = 1.0
+# Longest an island waits at a migration point for the others, in seconds; past it the others are presumed dead
+ISLAND_WAIT_TIMEOUT = 600.0
+
+
+def migration_target(index, n_islands, epoch, topology, topology_seed):
+    """Island that receives island `index`'s migrants in a given migration epoch."""
+    if topology == "ring":
+        return (index + 1) % n_islands
+    # Random topology: a fresh random cycle through all islands each epoch. Every island derives
+    # the same cycle from the shared seed, so each one sends and receives exactly one batch.
+    order = random.Random(topology_seed + epoch).sample(range(n_islands), n_islands)
+    return order[(order.index(index) + 1) % n_islands]
+
+
+def _to_plain(individuals):
+    return [(ind.tobytes(), ind.fitness.values) for ind in individuals]
+
+
+def _from_plain(items):
+    individuals = []
+    for genes, fitness in items:
+        ind = creator.Individual()
+        ind.frombytes(genes)
+        ind.fitness.values = fitness
+        individuals.append(ind)
+    return individuals
+
+
+# Stagnation votes exchanged at migration points
+VOTE_CONTINUE, VOTE_STAGNANT = 0, 1
+
+
+def _check_halt(reason, criteria, halt, barrier):
+    """
+    The deadline and the target stop every island after the generation that reached them, not at the next
+    migration point: the island raises the shared halt flag, which the others check after each generation,
+    and breaks the barrier so islands already waiting at a migration point wake up.
+    """
+    # update() reports stagnation before the deadline, but only the deadline stops without a vote
+    if reason == "stagnation" and criteria.deadline is not None and time.time() >= criteria.deadline:
+        reason = "deadline"
+    if reason in ("deadline", "target"):
+        halt.value = 1
+        barrier.abort()
+        return reason
+    if halt.value:
+        return "halted_by_other_island"
+    return None
+
+
+def _agree_to_stop(index, reason, votes, barrier, halt):
+    """Stagnation stops the islands only when every one of them agrees, so nobody waits for migrants that never come."""
+    votes[index] = VOTE_STAGNANT if reason == "stagnation" else VOTE_CONTINUE
+    try:
+        barrier.wait(ISLAND_WAIT_TIMEOUT)
+        decision = list(votes)
+        barrier.wait(ISLAND_WAIT_TIMEOUT)  # Everyone has read the votes before they are overwritten at the next epoch
+    except threading.BrokenBarrierError:
+        if halt.value:
+            return "halted_by_other_island"
+        raise
+    if all(vote == VOTE_STAGNANT for vote in decision):
+        return "stagnation"
+    return None
+
+
+def _island_main(index, problem_dir, seed, config, inboxes, results, votes, halt, barrier):
+    try:
+        import ai.genetic_solver as genetic_solver
+
+        optimizer = genetic_solver.ScheduleOptimizer.from_problem_arrays(load_problem_arrays(problem_dir), seed=seed)
+        optimizer.time_limit, optimizer.stagnation_limit, optimizer.target_soft = config['stop']
+        optimizer.instrument = config['instrument']
+        criteria = optimizer._stop_criteria(config['started'])
+        timer = optimizer._phase_timer()
+        pop, hof = optimizer._start_population(timer=timer, deadline=criteria.deadline)
+        stats = optimizer._new_stats()
+        n_generations = genetic_solver.N_GENERATIONS
+        gen = 0
+        stop_reason = _check_halt(criteria.update(gen, pop), criteria, halt, barrier)
+        while stop_reason is None and gen < n_generations:
+            gen += 1
+            optimizer._evolve_generation(pop, hof, timer=timer)
+            optimizer._log_generation(stats, gen, pop, prefix=f"[Island {index}] ")
+            reason = criteria.update(gen, pop)
+            stop_reason = _check_halt(reason, criteria, halt, barrier)
+
+            if stop_reason is None and gen % config['interval'] == 0 and gen < n_generations:
+                stop_reason = _agree_to_stop(index, reason, votes, barrier, halt)
+                if stop_reason:
+                    break
+
+                epoch = gen // config['interval']
+                target = migration_target(index, config['n_islands'], epoch, config['topology'], config['topology_seed'])
+                inboxes[target].put(_to_plain(tools.selBest(pop, config['n_migrants'])))
+
+                # Immigrants replace this island's worst individuals. Every island that passed the vote
+                # sends its batch before anything else, so a halt raised later cannot leave this waiting.
+                immigrants = _from_plain(inboxes[index].get(timeout=ISLAND_WAIT_TIMEOUT))
+                optimizer._attach_states(immigrants)
+                worst = {id(ind) for ind in tools.selWorst(pop, len(immigrants))}
+                pop[:] = [ind for ind in pop if id(ind) not in worst] + immigrants
+
+        if stop_reason:
+            print(f"[Island {index}] Stopping after {gen} generations ({stop_reason}).")
+        timer.end_generation()
+        summary = {**criteria.summary(gen, stop_reason or "max_generations"), **timer.summary()}
+        results.put((index, _to_plain(hof), _to_plain(tools.selBest(pop, 1)), summary))
+    except Exception:
+        barrier.abort()
+        results.put((index, None, traceback.format_exc(), None))
+
+
+def _sum_counts(dicts):
+    total = {}
+    for counts in dicts:
+        for key, value in counts.items():
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+def run_islands(optimizer):
+    """
+    Evolves optimizer.n_islands independent populations in separate processes, migrating the best
+    individuals every optimizer.migration_interval generations. The deadline and the target stop
+    all islands at any generation; stagnation is voted on at migration points. Returns the merged Pareto front, the best individual of every island and
+    a run summary.
+    """
+    n_islands = optimizer.n_islands
+    if optimizer.migration_topology not in MIGRATION_TOPOLOGIES:
+        raise ValueError(f"Unknown migration topology '{optimizer.migration_topology}', expected one of {MIGRATION_TOPOLOGIES}")
+
+    config = {
+        'n_islands': n_islands,
+        'interval': max(1, optimizer.migration_interval),
+        'n_migrants': optimizer.n_migrants,
+        'topology': optimizer.migration_topology,
+        'topology_seed': optimizer.rng.getrandbits(64),
+        'stop': (optimizer.time_limit, optimizer.stagnation_limit, optimizer.target_soft),
+        'started': time.time(),
+        # The observer lives in this process, so islands only report phase totals in their summaries
+        'instrument': optimizer.instrument or optimizer.observer is not None,
+    }
+    seeds = [optimizer.rng.getrandbits(64) for _ in range(n_islands)]
+
+    problem_dir = write_problem_arrays(optimizer)
+    inboxes = [multiprocessing.Queue() for _ in range(n_islands)]
+    results = multiprocessing.Queue()
+    votes = multiprocessing.Array('i', n_islands, lock=False)
+    halt = multiprocessing.Value('b', 0, lock=False)
+    barrier = multiprocessing.Barrier(n_islands)
+    islands = [
+        multiprocessing.Process(target=_island_main, args=(i, problem_dir, seeds[i], config, inboxes, results, votes, halt, barrier),
+                                daemon=True)
+        for i in range(n_islands)
+    ]
+    try:
+        for island in islands:
+            island.start()
+
+        fronts, bests, summaries = {}, {}, {}
+        while len(summaries) < n_islands:
+            try:
+                index, front, best, summary = results.get(timeout=ISLAND_POLL_INTERVAL)
+            except queue.Empty:
+                # An island killed without reporting (e.g. out of memory) would leave this wait hanging
+                dead = [i for i, island in enumerate(islands) if i not in summaries and not island.is_alive()]
+                if not dead:
+                    continue
+                # Its result may have arrived just before it exited
+                try:
+                    index, front, best, summary = results.get(timeout=ISLAND_POLL_INTERVAL)
+                except queue.Empty:
+                    raise RuntimeError(f"Island {dead[0]} process exited with code {islands[dead[0]].exitcode} "
+                                       "without reporting (killed, e.g. out of memory, or crashed).")
+            if front is None:
+                raise RuntimeError(f"Island {index} failed:\n{best}")
+            fronts[index], bests[index], summaries[index] = front, best, summary
+
+        # Merge in island order so the global front does not depend on which island finished first
+        hof = tools.ParetoFront()
+        finalists = []
+        for index in range(n_islands):
+            hof.update(_from_plain(fronts[index]))
+            finalists.extend(_from_plain(bests[index]))
+
+        feasible = [(s['first_feasible_seconds'], s['first_feasible_generation']) for s in summaries.values()
+                    if s['first_feasible_generation'] is not None]
+        run_info = {
+            "generations": max(s['generations'] for s in summaries.values()),
+            "stop_reason": next((s['stop_reason'] for s in summaries.values() if s['stop_reason'] != "halted_by_other_island"),
+                                summaries[0]['stop_reason']),
+            "elapsed_seconds": time.time() - config['started'],
+            "best_fitness": min(s['best_fitness'] for s in summaries.values()),
+            "first_feasible_generation": min(feasible)[1] if feasible else None,
+            "first_feasible_seconds": min(feasible)[0] if feasible else None,
+            # Summed over islands
+            "phase_seconds": _sum_counts(s['phase_seconds'] for s in summaries.values()),
+            "repairs": _sum_counts(s['repairs'] for s in summaries.values()),
+        }
+        return hof, finalists, run_info
+    finally:
+        for island in islands:
+            if island.is_alive():
+                island.terminate()
+            island.join()
+        shutil.rmtree(problem_dir, ignore_errors=True)
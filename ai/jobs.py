@@ -0,0 +1,395 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import traceback
+import uuid
+import pandas as pd
+from ai.utils import DB_NAME, load_data, load_current_schedule, format_solution, save_schedule_to_db
+from ai.reference_cache import cached_load_data
+from ai.solution_cache import fingerprint_inputs, frame_fingerprint, get_cached_solution, store_solution
+
+# How many GA solves may run at once across all app processes sharing the database
+MAX_CONCURRENT_SOLVES = int(os.environ.get("SCHOOL_PLANNER_MAX_SOLVES", "1"))
+# Seconds between dispatcher passes over the job table
+DISPATCH_INTERVAL = 0.5
+# Wall-clock budget of a background solve; the best schedule found so far is returned when it runs out
+SOLVE_TIME_LIMIT = float(os.environ.get("SCHOOL_PLANNER_SOLVE_TIME_LIMIT", "120"))
+# Seconds between progress writes of a running solve; generations in between are written as one batch,
+# and a pending cancel request is noticed at the next write
+PROGRESS_FLUSH_INTERVAL = 1.0
+# Seconds a progress write inside the GA loop may wait for a lock; if another writer holds the database
+# longer, the batch is kept and written at a later flush
+PROGRESS_BUSY_TIMEOUT = 0.05
+# Job statuses after which nothing changes any more
+FINISHED_STATUSES = ('done', 'failed', 'cancelled')
+
+
+def ensure_jobs_table(conn):
+    """
+    Creates the solve job tables if they do not exist yet. Run once by the JobDispatcher at startup
+    (and by submit_job); the read paths (job pages, progress polls) assume the tables exist.
+    """
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS solve_jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            params TEXT,
+            result TEXT,
+            error TEXT,
+            pid INTEGER,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            cancel_requested INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_solve_jobs_status ON solve_jobs (status, created_at);
+        CREATE TABLE IF NOT EXISTS solve_progress (
+            job_id TEXT NOT NULL,
+            generation INTEGER NOT NULL,
+            record TEXT NOT NULL,
+            PRIMARY KEY (job_id, generation)
+        );
+    """)
+    # Job tables created before cancellation existed
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(solve_jobs)")}
+    if 'cancel_requested' not in columns:
+        conn.execute("ALTER TABLE solve_jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+    conn.commit()
+
+
+def solver_options(params, warm_start=False):
+    """
+    ScheduleOptimizer options of a job: the effective stop settings, overridden by params['solver'].
+    Warm starts stop after a shorter stagnation window.
+    """
+    import ai.genetic_solver as genetic_solver
+
+    stagnation_limit = genetic_solver.WARM_STAGNATION_LIMIT if warm_start else genetic_solver.STAGNATION_LIMIT
+    return {'time_limit': SOLVE_TIME_LIMIT, 'stagnation_limit': stagnation_limit, 'target_soft': None,
+            **params.get('solver', {})}
+
+
+def solve_fingerprint(teachers_df, classrooms_df, curriculum_df, params, warm_start_df=None):
+    """
+    Cache key of a solve: input data, GA settings, effective solver options (stop settings included, so
+    changing SOLVE_TIME_LIMIT invalidates old entries) and seed (and the incumbent schedule for warm starts).
+    """
+    import ai.genetic_solver as genetic_solver
+
+    ga_settings = {
+        'population_size': genetic_solver.POPULATION_SIZE,
+        'generations': genetic_solver.N_GENERATIONS,
+        'cxpb': genetic_solver.CXPB,
+        'mutpb': genetic_solver.MUTPB,
+        'solver': solver_options(params, warm_start_df is not None),
+    }
+    if warm_start_df is not None:
+        ga_settings['warm_start'] = frame_fingerprint(warm_start_df)
+    return fingerprint_inputs(teachers_df, classrooms_df, curriculum_df, ga_settings)
+
+
+def _solve_inputs(conn, params, reference=None):
+    """
+    load_data output (or the given `reference`, e.g. from the reference cache) plus the current
+    schedule when the job asks for an incremental re-solve.
+    """
+    teachers_df, classrooms_df, curriculum_df = reference if reference is not None else load_data(conn)
+    warm_start_df = load_current_schedule(conn) if params.get('warm_start') else None
+    if warm_start_df is not None and warm_start_df.empty:
+        warm_start_df = None
+    return teachers_df, classrooms_df, curriculum_df, warm_start_df
+
+
+def submit_job(params=None, db_path=DB_NAME):
+    """
+    Queues a solve and returns its job id immediately. If an identical solve is in the
+    solution cache (and params['force'] is not set) the job is completed on the spot.
+    """
+    params = params or {}
+    job_id = uuid.uuid4().hex
+    with sqlite3.connect(db_path, timeout=30) as conn:
+        ensure_jobs_table(conn)
+        cached = None
+        if not params.get('force'):
+            # Fingerprinting only reads the frames, so the app process can use its cached copy
+            reference = cached_load_data(db_path)
+            teachers_df, classrooms_df, curriculum_df, warm_start_df = _solve_inputs(conn, params, reference)
+            fingerprint = solve_fingerprint(teachers_df, classrooms_df, curriculum_df, params, warm_start_df)
+            cached = get_cached_solution(conn, fingerprint)
+
+        now = time.time()
+        if cached is not None:
+            version = save_schedule_to_db(conn, pd.DataFrame(cached))
+            result = {'schedule': cached, 'logs': [f"Reused cached solution {fingerprint[:12]} for unchanged inputs."],
+                      'cached': True, 'version': version}
+            conn.execute(
+                "INSERT INTO solve_jobs (job_id, status, params, result, created_at, started_at, finished_at) "
+                "VALUES (?, 'done', ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(params), json.dumps(result), now, now, now),
+            )
+        else:
+            conn.execute(
+                "INSERT INTO solve_jobs (job_id, status, params, created_at) VALUES (?, 'queued', ?, ?)",
+                (job_id, json.dumps(params), now),
+            )
+    return job_id
+
+
+def get_job(job_id, db_path=DB_NAME, with_result=True):
+    """Returns the job row as a dict (params/result decoded), or None for an unknown id."""
+    with sqlite3.connect(db_path, timeout=30) as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM solve_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job['params'] = json.loads(job['params']) if job['params'] else {}
+    if with_result and job['result']:
+        job['result'] = json.loads(job['result'])
+    else:
+        job.pop('result')
+    job['queue_position'] = _queue_position(job, db_path) if job['status'] == 'queued' else 0
+    return job
+
+
+def get_result_summary(job_id, db_path=DB_NAME):
+    """
+    Logs, saved schedule version and whether a schedule was produced, read from a finished job's result with
+    SQLite's JSON functions, so the (potentially large) schedule payload is never decoded. None if there is no result.
+    """
+    with sqlite3.connect(db_path, timeout=30) as conn:
+        row = conn.execute(
+            "SELECT json_quote(json_extract(result, '$.logs')), json_extract(result, '$.version'), "
+            "json_type(result, '$.schedule') FROM solve_jobs WHERE job_id = ? AND result IS NOT NULL",
+            (job_id,),
+        ).fetchone()
+    if row is None:
+        return None
+    return {"logs": json.loads(row[0]) or [], "version": row[1], "has_schedule": row[2] == 'array'}
+
+
+def _queue_position(job, db_path):
+    with sqlite3.connect(db_path, timeout=30) as conn:
+        ahead = conn.execute(
+            "SELECT COUNT(*) FROM solve_jobs WHERE status = 'queued' AND created_at < ?", (job['created_at'],)
+        ).fetchone()[0]
+    return ahead + 1
+
+
+def get_progress(job_id, after_generation=-1, db_path=DB_NAME):
+    """Per-generation progress records of a job written after `after_generation`, oldest first."""
+    with sqlite3.connect(db_path, timeout=30) as conn:
+        rows = conn.execute(
+            "SELECT record FROM solve_progress WHERE job_id = ? AND generation > ? ORDER BY generation",
+            (job_id, after_generation),
+        ).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+
+def cancel_job(job_id, db_path=DB_NAME):
+    """
+    Cancels a job: a queued one right away, a running one at its next progress write (its solver then
+    stops and discards the schedule). Returns the job status after the request, or None for an unknown id.
+    """
+    with sqlite3.connect(db_path, timeout=30) as conn:
+        conn.execute(
+            "UPDATE solve_jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+            (time.time(), job_id),
+        )
+        conn.execute("UPDATE solve_jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'", (job_id,))
+        row = conn.execute("SELECT status FROM solve_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return row[0] if row else None
+
+
+class ProgressWriter:
+    """
+    GA observer of a background solve. Buffers the per-generation records and writes them in one
+    batch at most every PROGRESS_FLUSH_INTERVAL seconds, on its own connection that gives up after
+    PROGRESS_BUSY_TIMEOUT: while another writer holds the database (a schedule save, a job claim) the
+    batch stays buffered, so the solver loop never waits on SQLite. Returns True (stop) once the job
+    has been cancelled. close() writes what is left, waiting for the lock if needed.
+    """
+
+    def __init__(self, db_path, job_id, flush_interval=PROGRESS_FLUSH_INTERVAL):
+        self.conn = sqlite3.connect(db_path, timeout=PROGRESS_BUSY_TIMEOUT)
+        self.job_id = job_id
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.last_flush = 0.0
+        self.cancelled = False
+
+    def __call__(self, record):
+        hard_min, soft_min = record['min_fitness']
+        hard_avg, soft_avg = record['avg_fitness']
+        self.pending.append({
+            "gen": record['generation'],
+            "elapsed": round(record['elapsed_seconds'], 3),
+            "min_hard": hard_min, "min_soft": soft_min,
+            "avg_hard": round(hard_avg, 2), "avg_soft": round(soft_avg, 2),
+        })
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+        return self.cancelled
+
+    def flush(self):
+        """Writes the buffered records and reads the cancel flag; returns False if the database was busy."""
+        self.last_flush = time.monotonic()
+        try:
+            if self.pending:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO solve_progress (job_id, generation, record) VALUES (?, ?, ?)",
+                    [(self.job_id, r['gen'], json.dumps(r)) for r in self.pending],
+                )
+            cancelled = bool(self.conn.execute(
+                "SELECT cancel_requested FROM solve_jobs WHERE job_id = ?", (self.job_id,)
+            ).fetchone()[0])
+            self.conn.commit()
+        except sqlite3.OperationalError as exc:
+            if "locked" not in str(exc) and "busy" not in str(exc):
+                raise
+            self.conn.rollback()
+            return False
+        self.pending = []
+        self.cancelled = cancelled
+        return True
+
+    def close(self):
+        self.conn.execute(f"PRAGMA busy_timeout = {30 * 1000}")
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+
+
+def _finish_job(conn, job_id, status, result=None, error=None):
+    conn.execute(
+        "UPDATE solve_jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ?",
+        (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+    )
+    conn.commit()
+
+
+def run_job(job_id, db_path=DB_NAME):
+    """Solver process entry point: runs the GA for one job and stores the outcome in the job row."""
+    from ai.genetic_solver import solve_with_ga
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        params = get_job(job_id, db_path, with_result=False)['params']
+        log_messages = []
+        def logger(message):
+            print(message)
+            log_messages.append(message)
+
+        teachers_df, classrooms_df, curriculum_df, warm_start_df = _solve_inputs(conn, params)
+        if warm_start_df is not None:
+            logger("--- Incremental re-solve from the current schedule ---")
+        logger("--- Running Advanced Genetic Algorithm ---")
+        progress = ProgressWriter(db_path, job_id)
+        try:
+            solution, run_info = solve_with_ga(teachers_df, classrooms_df, curriculum_df, warm_start=warm_start_df,
+                                               return_info=True, observer=progress, instrument=True,
+                                               **solver_options(params, warm_start_df is not None))
+        finally:
+            progress.close()
+
+        if run_info['stop_reason'] == 'cancelled':
+            # The current timetable stays as it was
+            logger("Solve cancelled, the schedule found so far was discarded.")
+            _finish_job(conn, job_id, 'cancelled', result={'schedule': None, 'logs': log_messages, 'run_info': run_info})
+            return
+
+        schedule, version = None, None
+        if solution:
+            schedule_df = format_solution(solution)
+            version = save_schedule_to_db(conn, schedule_df)
+            schedule = schedule_df.to_dict('records')
+            # A run cut short by the deadline with conflicts left is not what the same inputs would give with more time
+            if run_info['best_fitness'][0] == 0 or run_info['stop_reason'] != 'deadline':
+                store_solution(conn, solve_fingerprint(teachers_df, classrooms_df, curriculum_df, params, warm_start_df), schedule)
+            else:
+                logger("Stopped at the deadline with hard conflicts left; the schedule is not cached.")
+        else:
+            logger("GA failed to find a solution.")
+        _finish_job(conn, job_id, 'done', result={'schedule': schedule, 'logs': log_messages, 'run_info': run_info,
+                                                   'version': version})
+    except Exception:
+        _finish_job(conn, job_id, 'failed', error=traceback.format_exc())
+        raise
+    finally:
+        conn.close()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+class JobDispatcher:
+    """
+    Starts queued jobs in separate solver processes, at most max_concurrent at a time.
+    Jobs are claimed inside an IMMEDIATE transaction, so several app processes can run
+    a dispatcher against the same database without exceeding the limit or double-starting a job.
+    """
+
+    def __init__(self, db_path=DB_NAME, max_concurrent=MAX_CONCURRENT_SOLVES):
+        self.db_path = db_path
+        self.max_concurrent = max(1, max_concurrent)
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = {}
+        with sqlite3.connect(db_path, timeout=30) as conn:
+            ensure_jobs_table(conn)
+
+    def tick(self):
+        """One dispatcher pass: reap finished solver processes, then start queued jobs while slots are free."""
+        for job_id, process in list(self._processes.items()):
+            if not process.is_alive():
+                process.join()
+                del self._processes[job_id]
+
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            self._fail_orphaned_jobs(conn)
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                running = conn.execute("SELECT COUNT(*) FROM solve_jobs WHERE status = 'running'").fetchone()[0]
+                row = None
+                if running < self.max_concurrent:
+                    row = conn.execute(
+                        "SELECT job_id FROM solve_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                    ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    break
+                job_id = row[0]
+                # Not daemonic: a solve may itself start worker or island processes
+                process = self._context.Process(target=run_job, args=(job_id, self.db_path))
+                process.start()
+                conn.execute(
+                    "UPDATE solve_jobs SET status = 'running', pid = ?, started_at = ? WHERE job_id = ?",
+                    (process.pid, time.time(), job_id),
+                )
+                conn.execute("COMMIT")
+                self._processes[job_id] = process
+        finally:
+            conn.close()
+
+    def _fail_orphaned_jobs(self, conn):
+        """Marks running jobs whose solver process died without reporting (crash, app restart) as failed."""
+        for job_id, pid in conn.execute("SELECT job_id, pid FROM solve_jobs WHERE status = 'running'").fetchall():
+            if job_id not in self._processes and (pid is None or not _pid_alive(pid)):
+                conn.execute(
+                    "UPDATE solve_jobs SET status = 'failed', error = ?, finished_at = ? WHERE job_id = ? AND status = 'running'",
+                    ("Solver process exited unexpectedly.", time.time(), job_id),
+                )
+
+    def shutdown(self):
+        for process in self._processes.values():
+            process.terminate()
+            process.join()
+        self._processes.clear()
@@ -0,0 +1,80 @@
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import numpy as np
+
+# Worker-side optimizer, rebuilt once per process from the memory-mapped problem arrays
+_worker_optimizer = None
+
+
+def resolve_worker_count(n_workers):
+    """None or 0 means one worker per CPU core."""
+    if not n_workers:
+        return os.cpu_count() or 1
+    return max(1, int(n_workers))
+
+
+def chunk_size(n_items, n_workers):
+    """Roughly four chunks per worker: small enough to balance uneven repair times, big enough to amortize IPC."""
+    return max(1, math.ceil(n_items / (n_workers * 4)))
+
+
+def write_problem_arrays(optimizer):
+    """Writes the optimizer's static problem arrays to a fresh temp directory of .npy files."""
+    problem_dir = tempfile.mkdtemp(prefix="school_planner_ga_")
+    for name, array in optimizer.problem_arrays().items():
+        np.save(os.path.join(problem_dir, f"{name}.npy"), array)
+    return problem_dir
+
+
+def load_problem_arrays(problem_dir):
+    """Memory-maps the arrays written by write_problem_arrays (read-only, pages shared between processes)."""
+    return {
+        name[:-len(".npy")]: np.load(os.path.join(problem_dir, name), mmap_mode="r")
+        for name in os.listdir(problem_dir)
+    }
+
+
+def _init_worker(problem_dir):
+    global _worker_optimizer
+    from ai.genetic_solver import ScheduleOptimizer
+
+    _worker_optimizer = ScheduleOptimizer.from_problem_arrays(load_problem_arrays(problem_dir))
+
+
+def build_individual(task):
+    return _worker_optimizer._build_individual(task)
+
+
+def vary_offspring(task):
+    return _worker_optimizer._vary_task(task)
+
+
+class ProblemPool:
+    """
+    Process pool whose workers share the optimizer's static problem data.
+    The arrays are written once to memory-mapped .npy files, so each worker maps the
+    same pages instead of receiving a pickled copy with every task.
+    """
+
+    def __init__(self, optimizer, n_workers):
+        self.n_workers = n_workers
+        self.problem_dir = write_problem_arrays(optimizer)
+        self._pool = multiprocessing.Pool(n_workers, initializer=_init_worker, initargs=(self.problem_dir,))
+
+    def map(self, func, items):
+        items = list(items)
+        return self._pool.map(func, items, chunksize=chunk_size(len(items), self.n_workers))
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+        shutil.rmtree(self.problem_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,149 @@
+import sqlite3
+import threading
+import pandas as pd
+from ai.utils import DB_NAME, load_data
+from ai.schedule_store import current_schedule_version, ensure_schedule_tables
+
+# Tables whose edits invalidate cached reference data; each gets insert/update/delete triggers
+REFERENCE_TABLES = ('teachers', 'subjects', 'classroom_types', 'classrooms', 'grade_sections',
+                    'teacher_specializations', 'curriculum')
+TRIGGER_OPERATIONS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def ensure_reference_version(conn):
+    """
+    Creates the reference_data_version row and the triggers that bump it on every edit of a
+    reference table. The random token changes whenever the row is recreated (e.g. a rebuilt
+    database), so a cache never mistakes a different database for the one it has loaded.
+    Triggers that were lost (tables dropped and recreated) are restored and the version is bumped,
+    since edits may have happened while they were missing.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reference_data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            token TEXT NOT NULL,
+            version INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO reference_data_version (id, token, version) VALUES (1, hex(randomblob(8)), 0)")
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in REFERENCE_TABLES:
+        if table not in existing:
+            continue
+        for operation in TRIGGER_OPERATIONS:
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_reference_{table}_{operation.lower()} AFTER {operation} ON {table}
+                BEGIN UPDATE reference_data_version SET version = version + 1 WHERE id = 1; END
+            """)
+    conn.execute("UPDATE reference_data_version SET version = version + 1 WHERE id = 1")
+    conn.commit()
+
+
+def reference_data_version(conn):
+    """(token, version) of the reference tables: changes on every edit, and only then."""
+    try:
+        token, version, triggers = conn.execute("""
+            SELECT token, version,
+                   (SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_reference_%')
+            FROM reference_data_version WHERE id = 1
+        """).fetchone()
+    except (sqlite3.OperationalError, TypeError):
+        triggers = None
+    if triggers != len(REFERENCE_TABLES) * len(TRIGGER_OPERATIONS):
+        ensure_reference_version(conn)
+        token, version = conn.execute("SELECT token, version FROM reference_data_version WHERE id = 1").fetchone()
+    return token, version
+
+
+def schedule_cache_key(version=None, db_path=DB_NAME):
+    """
+    (schedule version, reference data version) of a schedule version (the current one by default),
+    or None if there is no such schedule. Everything derived from one key stays valid forever, so it
+    can key caches of schedule views (timetables, analysis) across requests, sessions and processes.
+    """
+    with sqlite3.connect(db_path, timeout=30) as conn:
+        if version is None:
+            version = current_schedule_version(conn)
+            if version is None:
+                return None
+        else:
+            # A database from before versioning still has the legacy schedule table until it is migrated
+            ensure_schedule_tables(conn)
+            if conn.execute("SELECT 1 FROM schedule_versions WHERE version_id = ?", (version,)).fetchone() is None:
+                return None
+        return version, reference_data_version(conn)
+
+
+class ReferenceCache:
+    """
+    In-process cache of data derived from the reference tables, shared by all requests of an app
+    process. Every lookup costs one read of the version row; loaders only run again after an edit.
+    Cached DataFrames are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, db_path=DB_NAME):
+        self.db_path = db_path
+        self._key = None
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, loader):
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            key = reference_data_version(conn)
+            with self._lock:
+                if key != self._key:
+                    self._key, self._values = key, {}
+                if name in self._values:
+                    return self._values[name]
+            # Loaded after the version was read: an edit in between only causes one extra reload
+            value = loader(conn)
+        with self._lock:
+            if self._key == key:
+                self._values[name] = value
+        return value
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def reference_cache(db_path=DB_NAME):
+    """The process-wide cache of a database."""
+    with _caches_lock:
+        if db_path not in _caches:
+            _caches[db_path] = ReferenceCache(db_path)
+        return _caches[db_path]
+
+
+def load_name_maps(conn):
+    """Display names keyed by id: teachers, subjects, classrooms and sections (section_full_name)."""
+    teachers = pd.read_sql("SELECT teacher_id, teacher_name FROM teachers", conn).set_index('teacher_id')
+    subjects = pd.read_sql("SELECT subject_id, subject_name FROM subjects", conn).set_index('subject_id')
+    classrooms = pd.read_sql("SELECT classroom_id, classroom_name FROM classrooms", conn).set_index('classroom_id')
+    sections = pd.read_sql(
+        "SELECT section_id, 'Grade ' || grade || '-' || section_name AS section_full_name FROM grade_sections", conn
+    ).set_index('section_id')
+    return teachers, subjects, classrooms, sections
+
+
+def load_analysis_tables(conn):
+    """Teachers with their weekly hour limits and classrooms with their type names, for utilization analysis."""
+    teachers = pd.read_sql("SELECT teacher_id, teacher_name, max_weekly_hours FROM teachers", conn)
+    classrooms = pd.read_sql("""
+        SELECT c.classroom_id, c.classroom_name, ct.type_name
+        FROM classrooms c
+        JOIN classroom_types ct ON c.type_id = ct.type_id
+    """, conn)
+    return teachers, classrooms
+
+
+def cached_load_data(db_path=DB_NAME):
+    return reference_cache(db_path).get('load_data', load_data)
+
+
+def cached_name_maps(db_path=DB_NAME):
+    return reference_cache(db_path).get('name_maps', load_name_maps)
+
+
+def cached_analysis_tables(db_path=DB_NAME):
+    return reference_cache(db_path).get('analysis_tables', load_analysis_tables)
@@ -0,0 +1,234 @@
+import collections
+import contextlib
+import time
+import pandas as pd
+
+# Columns of a schedule row, in the order of the solver output (see format_solution)
+SCHEDULE_COLUMNS = ['section_id', 'subject_id', 'teacher_id', 'classroom_id', 'day_of_week', 'time_slot']
+# Saved versions kept (the current one included); older versions and the rows only they used are deleted on save
+SCHEDULE_VERSIONS_KEPT = 20
+
+# Timetable lookups by entity: URL kind -> (schedule column, reference table, display name expression)
+ENTITY_KINDS = {
+    'teacher': ('teacher_id', 'teachers', 'teacher_name'),
+    'classroom': ('classroom_id', 'classrooms', 'classroom_name'),
+    'section': ('section_id', 'grade_sections', "'Grade ' || grade || '-' || section_name"),
+}
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS schedule_versions (
+        version_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at REAL NOT NULL,
+        n_rows INTEGER NOT NULL,
+        rows_added INTEGER NOT NULL,
+        rows_removed INTEGER NOT NULL,
+        is_current INTEGER NOT NULL DEFAULT 0
+    )""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_schedule_versions_current ON schedule_versions (is_current) WHERE is_current = 1",
+    """CREATE TABLE IF NOT EXISTS schedule_entries (
+        entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        section_id INTEGER,
+        teacher_id INTEGER,
+        subject_id INTEGER,
+        classroom_id INTEGER,
+        day_of_week INTEGER,
+        time_slot INTEGER,
+        valid_from INTEGER NOT NULL,
+        valid_to INTEGER,
+        FOREIGN KEY (section_id) REFERENCES grade_sections(section_id),
+        FOREIGN KEY (teacher_id) REFERENCES teachers(teacher_id),
+        FOREIGN KEY (subject_id) REFERENCES subjects(subject_id),
+        FOREIGN KEY (classroom_id) REFERENCES classrooms(classroom_id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_schedule_entries_validity ON schedule_entries (valid_to, valid_from)",
+    # One entity's week of the current version is a single index range scan, whatever the school size
+    *(f"CREATE INDEX IF NOT EXISTS idx_schedule_current_{kind} ON schedule_entries ({column}, day_of_week, time_slot) "
+      "WHERE valid_to IS NULL" for kind, (column, _, _) in ENTITY_KINDS.items()),
+    # Same columns as the schedule table of earlier releases, so existing readers keep working
+    """CREATE VIEW IF NOT EXISTS schedule AS
+        SELECT entry_id AS schedule_id, section_id, teacher_id, subject_id, classroom_id, day_of_week, time_slot
+        FROM schedule_entries WHERE valid_to IS NULL""",
+)
+# Names of the tables, indexes and view above
+SCHEMA_OBJECTS = {statement.split(" IF NOT EXISTS ")[1].split()[0] for statement in SCHEMA}
+
+
+def ensure_schedule_tables(conn):
+    """
+    Creates the versioned schedule tables if they do not exist yet, switches the database to WAL
+    (readers keep reading the last committed version while a new one is written) and migrates a
+    plain `schedule` table from before versioning into version 1.
+
+    Every saved schedule is a numbered version in schedule_versions; exactly one has is_current = 1.
+    Rows live in schedule_entries and are valid from the version that added them until the version
+    that removed them (valid_to, NULL while current), so a new version only writes the rows that
+    changed. The `schedule` view shows the rows of the current version.
+    """
+    names = sorted(SCHEMA_OBJECTS)
+    objects = dict(conn.execute(
+        f"SELECT name, type FROM sqlite_master WHERE name IN ({', '.join('?' * len(names))})", names
+    ).fetchall())
+    if objects.get('schedule') == 'view' and SCHEMA_OBJECTS <= objects.keys():
+        return
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("PRAGMA journal_mode=WAL")
+    # One transaction, so an interrupted migration leaves the old table untouched
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        legacy_rows = []
+        if objects.get('schedule') == 'table':
+            legacy_rows = conn.execute(f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedule").fetchall()
+            conn.execute("DROP TABLE schedule")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        if legacy_rows:
+            _write_rows(conn, [tuple(row) for row in legacy_rows])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def current_schedule_version(conn):
+    """Id of the current schedule version, or None if no schedule has been saved yet."""
+    ensure_schedule_tables(conn)
+    row = conn.execute("SELECT version_id FROM schedule_versions WHERE is_current = 1").fetchone()
+    return row[0] if row else None
+
+
+def list_schedule_versions(conn):
+    """All saved versions, newest first."""
+    ensure_schedule_tables(conn)
+    return pd.read_sql_query("SELECT * FROM schedule_versions ORDER BY version_id DESC", conn)
+
+
+def load_schedule_version(conn, version=None):
+    """Schedule rows of a version (the current one by default), in SCHEDULE_COLUMNS order."""
+    if version is None:
+        version = current_schedule_version(conn)
+    else:
+        ensure_schedule_tables(conn)
+    return pd.read_sql_query(
+        f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedule_entries "
+        "WHERE valid_from <= ? AND (valid_to IS NULL OR valid_to > ?) ORDER BY entry_id",
+        conn, params=(version, version),
+    )
+
+
+def save_schedule_version(conn, schedule_df):
+    """
+    Saves a schedule as the new current version in one IMMEDIATE transaction, writing only the rows
+    that differ from the current version, and prunes versions beyond SCHEDULE_VERSIONS_KEPT. Readers see
+    either the old or the new version, never a mix.
+    Returns (version id, rows added, rows removed); an unchanged schedule keeps its version.
+    """
+    ensure_schedule_tables(conn)
+    rows = list(schedule_df[SCHEDULE_COLUMNS].astype('int64').itertuples(index=False, name=None))
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = _write_rows(conn, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return result
+
+
+def _write_rows(conn, rows):
+    """Body of save_schedule_version, inside the caller's transaction."""
+    current = conn.execute("SELECT version_id FROM schedule_versions WHERE is_current = 1").fetchone()
+    # Multiset difference against the current rows: matching rows stay, the rest are closed or added
+    wanted = collections.Counter(rows)
+    removed = []
+    for entry_id, *row in conn.execute(
+            f"SELECT entry_id, {', '.join(SCHEDULE_COLUMNS)} FROM schedule_entries WHERE valid_to IS NULL").fetchall():
+        row = tuple(row)
+        if wanted[row] > 0:
+            wanted[row] -= 1
+        else:
+            removed.append(entry_id)
+    added = list(wanted.elements())
+    if current is not None and not added and not removed:
+        return current[0], 0, 0
+
+    version = conn.execute(
+        "INSERT INTO schedule_versions (created_at, n_rows, rows_added, rows_removed) VALUES (?, ?, ?, ?)",
+        (time.time(), len(rows), len(added), len(removed)),
+    ).lastrowid
+    conn.executemany("UPDATE schedule_entries SET valid_to = ? WHERE entry_id = ?", [(version, e) for e in removed])
+    conn.executemany(
+        f"INSERT INTO schedule_entries ({', '.join(SCHEDULE_COLUMNS)}, valid_from) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(*row, version) for row in added],
+    )
+    # The pointer moves last, in the same transaction as the rows it points to
+    conn.execute("UPDATE schedule_versions SET is_current = 0 WHERE is_current = 1")
+    conn.execute("UPDATE schedule_versions SET is_current = 1 WHERE version_id = ?", (version,))
+    _prune_versions(conn)
+    return version, len(added), len(removed)
+
+
+def _prune_versions(conn):
+    """
+    Deletes all but the newest SCHEDULE_VERSIONS_KEPT versions, inside the caller's transaction. A row is visible
+    in versions valid_from .. valid_to - 1, so rows closed at or before the oldest kept version are unreachable.
+    """
+    oldest_kept = conn.execute(
+        "SELECT version_id FROM schedule_versions ORDER BY version_id DESC LIMIT 1 OFFSET ?", (SCHEDULE_VERSIONS_KEPT - 1,)
+    ).fetchone()
+    if oldest_kept is None:
+        return
+    conn.execute("DELETE FROM schedule_entries WHERE valid_to IS NOT NULL AND valid_to <= ?", oldest_kept)
+    conn.execute("DELETE FROM schedule_versions WHERE version_id < ?", oldest_kept)
+
+
+@contextlib.contextmanager
+def read_snapshot(conn):
+    """Runs the enclosed reads in one read transaction, so they all see the same schedule version."""
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+
+
+def list_entities(conn, kind):
+    """(id, name) of every teacher, classroom or section, ordered by name."""
+    column, table, name = ENTITY_KINDS[kind]
+    return conn.execute(f"SELECT {column}, {name} AS name FROM {table} ORDER BY name").fetchall()
+
+
+def load_entity_timetable(conn, kind, entity_id):
+    """
+    One teacher's, classroom's or section's week in the current schedule version, with display
+    names, ordered by day and slot. Returns None for an unknown entity.
+    """
+    column, table, name = ENTITY_KINDS[kind]
+    ensure_schedule_tables(conn)
+    with read_snapshot(conn):
+        row = conn.execute(f"SELECT {name} FROM {table} WHERE {column} = ?", (entity_id,)).fetchone()
+        if row is None:
+            return None
+        version = conn.execute("SELECT version_id FROM schedule_versions WHERE is_current = 1").fetchone()
+        entries = conn.execute(f"""
+            SELECT s.day_of_week, s.time_slot, s.section_id, s.subject_id, s.teacher_id, s.classroom_id,
+                   sub.subject_name, t.teacher_name, c.classroom_name,
+                   'Grade ' || g.grade || '-' || g.section_name AS section_full_name
+            FROM schedule s
+            LEFT JOIN subjects sub ON sub.subject_id = s.subject_id
+            LEFT JOIN teachers t ON t.teacher_id = s.teacher_id
+            LEFT JOIN classrooms c ON c.classroom_id = s.classroom_id
+            LEFT JOIN grade_sections g ON g.section_id = s.section_id
+            WHERE s.{column} = ?
+            ORDER BY s.day_of_week, s.time_slot
+        """, (entity_id,))
+        keys = [description[0] for description in entries.description]
+        timetable = [dict(zip(keys, values)) for values in entries.fetchall()]
+    return {"kind": kind, "id": entity_id, "name": row[0], "version": version[0] if version else None, "entries": timetable}
+
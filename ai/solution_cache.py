@@ -0,0 +1,84 @@
+import hashlib
+import json
+import time
+import zlib
+import pandas as pd
+
+# LRU limits for the solution_cache table
+MAX_CACHE_ENTRIES = 50
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def ensure_cache_table(conn):
+    """Creates the solution cache table if it does not exist yet."""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS solution_cache (
+            fingerprint TEXT PRIMARY KEY,
+            schedule BLOB NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_solution_cache_lru ON solution_cache (last_used_at);
+    """)
+    conn.commit()
+
+
+def _frame_digest(df):
+    """Order-independent digest of a DataFrame's columns, dtypes and rows."""
+    df = df[sorted(df.columns)]
+    df = df.sort_values(list(df.columns), kind="mergesort").reset_index(drop=True)
+    header = json.dumps([(col, str(dtype)) for col, dtype in df.dtypes.items()]).encode()
+    return header + pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()
+
+
+def frame_fingerprint(df):
+    """SHA-256 of a single DataFrame, row-order independent."""
+    return hashlib.sha256(_frame_digest(df)).hexdigest()
+
+
+def fingerprint_inputs(teachers_df, classrooms_df, curriculum_df, params):
+    """
+    Stable fingerprint of a solve: the three load_data frames plus the GA parameters and seed.
+    Identical inputs give the same key regardless of row order.
+    """
+    digest = hashlib.sha256()
+    for df in (teachers_df, classrooms_df, curriculum_df):
+        digest.update(_frame_digest(df))
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def get_cached_solution(conn, fingerprint):
+    """Returns the cached schedule records for a fingerprint (and bumps its LRU stamp), or None."""
+    ensure_cache_table(conn)
+    row = conn.execute("SELECT schedule FROM solution_cache WHERE fingerprint = ?", (fingerprint,)).fetchone()
+    if row is None:
+        return None
+    conn.execute(
+        "UPDATE solution_cache SET hits = hits + 1, last_used_at = ? WHERE fingerprint = ?",
+        (time.time(), fingerprint),
+    )
+    conn.commit()
+    return json.loads(zlib.decompress(row[0]))
+
+
+def store_solution(conn, fingerprint, schedule_records, max_entries=MAX_CACHE_ENTRIES, max_bytes=MAX_CACHE_BYTES):
+    """Stores a solved schedule under its fingerprint, then evicts least recently used entries over the limits."""
+    ensure_cache_table(conn)
+    blob = zlib.compress(json.dumps(schedule_records).encode())
+    now = time.time()
+    conn.execute(
+        "INSERT OR REPLACE INTO solution_cache (fingerprint, schedule, size_bytes, hits, created_at, last_used_at) "
+        "VALUES (?, ?, ?, 0, ?, ?)",
+        (fingerprint, blob, len(blob), now, now),
+    )
+
+    total_bytes = 0
+    entries = conn.execute("SELECT fingerprint, size_bytes FROM solution_cache ORDER BY last_used_at DESC").fetchall()
+    for position, (key, size) in enumerate(entries):
+        total_bytes += size
+        if position >= max_entries or total_bytes > max_bytes:
+            conn.execute("DELETE FROM solution_cache WHERE fingerprint = ?", (key,))
+    conn.commit()
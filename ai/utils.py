@@ -1,10 +1,17 @@
 import sqlite3
 import pandas as pd
+from ai.schedule_store import ENTITY_KINDS, load_schedule_version, save_schedule_version
 
 DB_NAME = "school_planner.db"
 # Define the school's schedule parameters
 DAYS_OF_WEEK = range(1, 6)  # 1=Monday, 5=Friday
 TIME_SLOTS_PER_DAY = 8      # e.g., 8 periods from 9am to 4pm
+# Timetable cell lines after the subject name, per kind of timetable: (prefix, name column) twice
+GRID_CELL_LINES = {
+    'section': (('w/ ', 'teacher_name'), ('@ ', 'classroom_name')),
+    'teacher': (('for ', 'section_full_name'), ('@ ', 'classroom_name')),
+    'classroom': (('for ', 'section_full_name'), ('w/ ', 'teacher_name')),
+}
 
 def load_data(conn):
     """Loads all required data from the database into pandas DataFrames."""
@@ -78,20 +85,27 @@ def load_data(conn):
     print("Data loaded and cleaned successfully.")
     return teachers_df, classrooms_df, curriculum_df
 
+def load_current_schedule(conn):
+    """Loads the currently saved schedule (e.g. as the warm start of an incremental re-solve)."""
+    return load_schedule_version(conn)
+
 def save_schedule_to_db(conn, schedule_df):
-    """Saves the generated schedule DataFrame to the database."""
+    """
+    Saves the generated schedule DataFrame to the database as a new schedule version (see
+    ai/schedule_store.py); earlier versions are kept. Returns the id of the current version.
+    """
     if schedule_df is None or schedule_df.empty:
         print("No schedule to save.")
-        return
+        return None
 
     print("Saving schedule to database...")
-    cursor = conn.cursor()
-    # Clear the old schedule before inserting the new one
-    cursor.execute("DELETE FROM schedule;")
-    
-    schedule_df.to_sql('schedule', conn, if_exists='append', index=False)
-    conn.commit()
-    print(f"{len(schedule_df)} class slots have been scheduled and saved.")
+    version, added, removed = save_schedule_version(conn, schedule_df)
+    if added or removed:
+        print(f"{len(schedule_df)} class slots have been scheduled and saved as version {version} "
+              f"({added} rows written, {removed} replaced).")
+    else:
+        print(f"{len(schedule_df)} class slots unchanged, version {version} stays current.")
+    return version
 
 def format_solution(solution_dict):
     """Converts a solver's solution dictionary to a pandas DataFrame."""
@@ -108,4 +122,72 @@ def format_solution(solution_dict):
             'day_of_week': day,
             'time_slot': time_slot
         })
-    return pd.DataFrame(schedule_data)
\ No newline at end of file
+    return pd.DataFrame(schedule_data)
+
+
+def _double_bookings(schedule_df, resource):
+    """Rows of every (resource, day, slot) booked more than once, grouped in order of first appearance."""
+    keys = [resource, 'day_of_week', 'time_slot']
+    clashing = schedule_df.loc[schedule_df.duplicated(keys, keep=False)]
+    return clashing, [clashing[k] for k in keys]
+
+def get_schedule_conflicts(schedule_df):
+    """
+    Detects and returns a list of conflicts from a generated schedule. Double bookings are found with
+    duplicated() on the key columns, so messages are only built for the rows that actually conflict.
+    """
+    if schedule_df is None or schedule_df.empty:
+        return []
+
+    conflicts = []
+    clashing, keys = _double_bookings(schedule_df, 'teacher_id')
+    if not clashing.empty:
+        classes = (clashing['subject_name'] + " for " + clashing['section_full_name']).groupby(keys, sort=False).agg("; ".join)
+        for (_, day, slot), booked in classes.items():
+            conflicts.append(f"Teacher Conflict: Day {day}, Slot {slot} - Teacher is double-booked with: {booked}")
+    clashing, keys = _double_bookings(schedule_df, 'classroom_id')
+    for _, day, slot in clashing.groupby(keys, sort=False).size().index:
+        conflicts.append(f"Room Conflict: Day {day}, Slot {slot} - Room is double-booked.")
+    clashing, keys = _double_bookings(schedule_df, 'section_id')
+    for _, day, slot in clashing.groupby(keys, sort=False).size().index:
+        conflicts.append(f"Section Conflict: Day {day}, Slot {slot} - Section has overlapping classes.")
+    return conflicts
+
+def build_timetable_grids(schedule_df, name_maps):
+    """
+    Timetable grids of every section, teacher and classroom, built in one pass over the schedule per kind.
+    name_maps are the (teachers, subjects, classrooms, sections) name tables indexed by id.
+
+    Returns {kind: {entity_id: {"name": ..., "grid": grid}}}, where a grid has TIME_SLOTS_PER_DAY rows of
+    one cell per day: None for a free slot, else the three display lines [subject, with/for ..., @/w/ ...].
+    Entities without classes get an empty grid; in a double-booked slot the first class is shown.
+    """
+    teachers, subjects, classrooms, sections = name_maps
+    entity_names = {'teacher': teachers['teacher_name'], 'classroom': classrooms['classroom_name'],
+                    'section': sections['section_full_name']}
+    names = {
+        'subject_name': schedule_df['subject_id'].map(subjects['subject_name']),
+        'teacher_name': schedule_df['teacher_id'].map(teachers['teacher_name']),
+        'classroom_name': schedule_df['classroom_id'].map(classrooms['classroom_name']),
+        'section_full_name': schedule_df['section_id'].map(sections['section_full_name']),
+    }
+    names = {column: values.fillna('').tolist() for column, values in names.items()}
+    days = schedule_df['day_of_week'].astype(int).tolist()
+    slots = schedule_df['time_slot'].astype(int).tolist()
+    first_day = DAYS_OF_WEEK[0]
+
+    grids = {}
+    for kind, ((prefix_2, column_2), (prefix_3, column_3)) in GRID_CELL_LINES.items():
+        entities = {int(entity_id): {"name": name, "grid": [[None] * len(DAYS_OF_WEEK) for _ in range(TIME_SLOTS_PER_DAY)]}
+                    for entity_id, name in entity_names[kind].items()}
+        rows = zip(schedule_df[ENTITY_KINDS[kind][0]].astype(int).tolist(), days, slots,
+                   names['subject_name'], names[column_2], names[column_3])
+        for entity_id, day, slot, subject, line_2, line_3 in rows:
+            entity = entities.get(entity_id)
+            if entity is None:
+                continue
+            row = entity["grid"][slot - 1]
+            if row[day - first_day] is None:
+                row[day - first_day] = [subject, prefix_2 + line_2, prefix_3 + line_3]
+        grids[kind] = entities
+    return grids
@@ -1,9 +1,18 @@
-import openai
-import pandas as pd
+import argparse
 import json
+import os
 import random
+import sqlite3
+import sys
+import time
+import numpy as np
+import pandas as pd
 
-client = openai.OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
+# Lets `python data/generate_data.py` import the database package from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LLM_BASE_URL = "http://localhost:1234/v1"
+_client = None
 
 NUM_TEACHERS = 120
 NUM_CLASSROOMS = 50
@@ -24,11 +33,20 @@ CLASSROOM_TYPES_MAPPING = {
 }
 
 
+def _llm_client():
+    """OpenAI client for the local LM Studio server, created on first use so offline mode never needs openai."""
+    global _client
+    if _client is None:
+        import openai
+        _client = openai.OpenAI(base_url=LLM_BASE_URL, api_key="lm-studio")
+    return _client
+
+
 def generate_data_with_llm(prompt, temperature=0.7):
     """Calls the local LLM to generate data based on a prompt."""
     print(f"Sending prompt to LLM:\n---\n{prompt}\n---")
     try:
-        completion = client.chat.completions.create(
+        completion = _llm_client().chat.completions.create(
             model="local-model",  # This value doesn't matter for LM Studio
             messages=[{"role": "user", "content": prompt}],
             temperature=temperature,
@@ -87,14 +105,15 @@ def generate_teachers():
 
 
 
-def generate_classrooms():
+def generate_classrooms(num_classrooms=NUM_CLASSROOMS):
     """Generates classrooms of different types."""
-    # Define distribution
-    num_labs = 8
-    num_pe = 4
-    num_kitchens = 2
-    num_computer_labs = 6
-    num_normal = NUM_CLASSROOMS - (num_labs + num_pe + num_kitchens + num_computer_labs)
+    # Define distribution (specialist rooms grow with the school, relative to the default 50 rooms)
+    factor = num_classrooms / NUM_CLASSROOMS
+    num_labs = max(1, round(8 * factor))
+    num_pe = max(1, round(4 * factor))
+    num_kitchens = max(1, round(2 * factor))
+    num_computer_labs = max(1, round(6 * factor))
+    num_normal = max(1, num_classrooms - (num_labs + num_pe + num_kitchens + num_computer_labs))
 
     room_counts = {
         "Science Lab": num_labs,
@@ -121,20 +140,32 @@ def generate_classrooms():
             classroom_id_counter += 1
     return pd.DataFrame(classrooms)
 
-def generate_curriculum():
-    """Generates curriculum requirements for each grade-section."""
-    # Create grade-sections first
+def build_grade_sections(grades=GRADES, sections=SECTIONS):
+    """One row per (grade, section) with sequential section ids."""
     grade_sections = []
     section_id_counter = 1
-    for grade in GRADES:
-        for section in SECTIONS:
+    for grade in grades:
+        for section in sections:
             grade_sections.append({
                 "section_id": section_id_counter,
                 "grade": grade,
                 "section_name": section
             })
             section_id_counter += 1
-    df_grade_sections = pd.DataFrame(grade_sections)
+    return pd.DataFrame(grade_sections)
+
+
+def required_room_type(subject):
+    for room_type, subjects_in_type in CLASSROOM_TYPES_MAPPING.items():
+        if subject in subjects_in_type:
+            return room_type
+    return "Normal Classroom" # Default
+
+
+def generate_curriculum():
+    """Generates curriculum requirements for each grade-section."""
+    # Create grade-sections first
+    df_grade_sections = build_grade_sections()
 
     # Generate curriculum for each grade
     curriculum_data = []
@@ -168,172 +199,192 @@ def generate_curriculum():
         sections_for_grade = df_grade_sections[df_grade_sections['grade'] == grade]
         for _, row in sections_for_grade.iterrows():
             for subject, hours in grade_curriculum.items():
-                 # Find the required room type
-                required_room_type = "Normal Classroom" # Default
-                for room_type, subjects_in_type in CLASSROOM_TYPES_MAPPING.items():
-                    if subject in subjects_in_type:
-                        required_room_type = room_type
-                        break
                 curriculum_data.append({
                     "section_id": row['section_id'],
                     "subject_name": subject,
                     "weekly_hours": hours,
-                    "required_classroom_type": required_room_type
+                    "required_classroom_type": required_room_type(subject)
                 })
 
     df_curriculum = pd.DataFrame(curriculum_data)
     return df_grade_sections, df_curriculum
 
-def main():
-    """Main function to generate all data and save to CSVs."""
-    print("Generating Teacher Data...")
-    df_teachers, df_teacher_specializations = generate_teachers()
-    df_teachers.to_csv("teachers.csv", index=False)
-    df_teacher_specializations.to_csv("teacher_specializations.csv", index=False)
-    print("Teacher data saved to teachers.csv and teacher_specializations.csv")
 
-    print("\nGenerating Classroom Data...")
-    df_classrooms = generate_classrooms()
-    df_classrooms.to_csv("classrooms.csv", index=False)
-    print("Classroom data saved to classrooms.csv")
+# --- Offline Generator (no LLM; seeded and scalable) ---
+FIRST_NAMES = [
+    "Aisha", "Alejandro", "Amara", "Andrei", "Anika", "Arthur", "Beatriz", "Bilal", "Camille", "Chen",
+    "Daniel", "Dmitri", "Eleanor", "Elif", "Emeka", "Fatima", "Felix", "Grace", "Hana", "Hugo",
+    "Ibrahim", "Ingrid", "Isabel", "Jamal", "Javier", "Julia", "Kenji", "Kofi", "Laila", "Lars",
+    "Leila", "Lucas", "Maya", "Mateo", "Mei", "Nadia", "Noah", "Olga", "Omar", "Priya",
+    "Rafael", "Rania", "Rosa", "Samir", "Sara", "Sofia", "Tariq", "Thomas", "Valentina", "Yusuf",
+]
+LAST_NAMES = [
+    "Abbasi", "Adeyemi", "Andersen", "Bauer", "Bianchi", "Chowdhury", "Costa", "Dubois", "Eriksson", "Fischer",
+    "Finch", "Garcia", "Haddad", "Hansen", "Hoang", "Ivanova", "Jensen", "Kaur", "Khan", "Kim",
+    "Kowalski", "Larsen", "Lopez", "Mahmoud", "Mensah", "Moreau", "Murphy", "Nakamura", "Nguyen", "Novak",
+    "Okafor", "Oliveira", "Park", "Patel", "Petrov", "Quispe", "Rahman", "Rossi", "Santos", "Schmidt",
+    "Silva", "Sato", "Suzuki", "Tanaka", "Torres", "Vance", "Wagner", "Wang", "Yilmaz", "Zhang",
+]
 
-    print("\nGenerating Curriculum Data...")
-    df_grade_sections, df_curriculum = generate_curriculum()
-    df_grade_sections.to_csv("grade_sections.csv", index=False)
-    df_curriculum.to_csv("curriculum.csv", index=False)
-    print("Curriculum data saved to grade_sections.csv and curriculum.csv")
+# Weekly hours per subject for each school stage (29-32 hours a week)
+CURRICULUM_TEMPLATES = {
+    "primary": {"Mathematics": 6, "English": 7, "Biology": 2, "History": 2, "Geography": 2,
+                "Physical Education (PE)": 3, "Art": 3, "Music": 2, "Computer Science": 1, "Nutrition": 1},
+    "middle": {"Mathematics": 6, "English": 6, "Biology": 2, "Physics": 2, "Chemistry": 2, "History": 2,
+               "Geography": 2, "Physical Education (PE)": 2, "Art": 2, "Music": 1, "Computer Science": 2, "Nutrition": 1},
+    "secondary": {"Mathematics": 6, "English": 5, "Biology": 3, "Physics": 3, "Chemistry": 3, "History": 2,
+                  "Geography": 2, "Physical Education (PE)": 2, "Art": 1, "Music": 1, "Computer Science": 3, "Nutrition": 1},
+}
+# Probability of a teacher holding 1, 2 or 3 specializations
+SPECIALIZATION_COUNTS = [1, 2, 3]
+SPECIALIZATION_WEIGHTS = [0.3, 0.3, 0.4]
 
-    # Static data
-    df_subjects = pd.DataFrame(SUBJECTS_LIST, columns=["subject_name"])
-    df_subjects.to_csv("subjects.csv", index=False)
-    print("\nSubjects data saved to subjects.csv")
 
-    df_classroom_types = pd.DataFrame(list(CLASSROOM_TYPES_MAPPING.keys()), columns=["type_name"])
-    df_classroom_types.to_csv("classroom_types.csv", index=False)
-    print("Classroom types data saved to classroom_types.csv")
+def school_stage(grade):
+    if grade <= 4:
+        return "primary"
+    if grade <= 8:
+        return "middle"
+    return "secondary"
 
 
-if __name__ == "__main__":
-    main()
+def section_names(count):
+    """A, B, ..., Z, AA, AB, ... for any number of sections per grade."""
+    names = []
+    for i in range(count):
+        name = ""
+        i += 1
+        while i:
+            i, rem = divmod(i - 1, 26)
+            name = chr(ord("A") + rem) + name
+        names.append(name)
+    return names
 
 
-def generate_teachers():
-    """Generates a list of teachers and their specializations."""
-    prompt = f"""
-    Generate a list of {NUM_TEACHERS} unique and diverse first and last names for school teachers.
-    Format the output as a simple JSON array of strings. For example: ["John Doe", "Jane Smith"].
+def generate_offline_curriculum(rng, grades, sections):
     """
-    names_json_str = generate_data_with_llm(prompt)
-    teacher_names = json.loads(names_json_str)
-
-    teachers = []
-    specializations = []
-    teacher_id_counter = 1
-
-    for name in teacher_names[:NUM_TEACHERS]:
-        teachers.append({
-            "teacher_id": teacher_id_counter,
-            "teacher_name": name,
-            "max_weekly_hours": random.randint(18, 25) # Standard teaching load
-        })
+    Grade curricula from the stage templates, each grade with a small seeded variation
+    (an hour moved between two subjects). All sections of a grade share the grade's curriculum.
+    """
+    df_grade_sections = build_grade_sections(grades, sections)
+    grade_curricula = []
+    for grade in grades:
+        hours = dict(CURRICULUM_TEMPLATES[school_stage(grade)])
+        subjects = list(hours)
+        for _ in range(rng.integers(0, 3)):
+            donor, receiver = rng.choice(subjects, size=2, replace=False)
+            if hours[donor] > 1:
+                hours[donor] -= 1
+                hours[receiver] += 1
+        grade_curricula.extend({"grade": grade, "subject_name": subject, "weekly_hours": h} for subject, h in hours.items())
+
+    df_curriculum = df_grade_sections[["section_id", "grade"]].merge(pd.DataFrame(grade_curricula), on="grade")
+    df_curriculum["required_classroom_type"] = df_curriculum["subject_name"].map(required_room_type)
+    df_curriculum = df_curriculum.sort_values(["section_id", "subject_name"], kind="stable").drop(columns="grade")
+    return df_grade_sections, df_curriculum.reset_index(drop=True)
+
+
+def generate_offline_teachers(rng, num_teachers, df_curriculum):
+    """
+    Teachers with unique generated names and 1-3 specializations. Subjects are drawn in proportion
+    to their share of the weekly curriculum hours, so staffing follows demand.
+    """
+    demand = df_curriculum.groupby("subject_name")["weekly_hours"].sum().reindex(SUBJECTS_LIST, fill_value=0)
+    weights = (demand + demand.sum() * 0.01).to_numpy(dtype=float)
+
+    # Unique names: first x last, with a middle initial once the plain combinations run out
+    combos = len(FIRST_NAMES) * len(LAST_NAMES)
+    with_initial = num_teachers > combos
+    if num_teachers > combos * 26:
+        raise ValueError(f"At most {combos * 26} teachers can get unique generated names.")
+    picks = rng.permutation(combos * 26 if with_initial else combos)[:num_teachers]
+    initials, picks = np.divmod(picks, combos)
+    first, last = np.divmod(picks, len(LAST_NAMES))
+    names = [
+        f"{FIRST_NAMES[f]} {chr(ord('A') + i)}. {LAST_NAMES[l]}" if with_initial else f"{FIRST_NAMES[f]} {LAST_NAMES[l]}"
+        for f, l, i in zip(first, last, initials)
+    ]
+    teacher_ids = np.arange(1, num_teachers + 1)
+    df_teachers = pd.DataFrame({
+        "teacher_id": teacher_ids,
+        "teacher_name": names,
+        "max_weekly_hours": rng.integers(18, 26, size=num_teachers), # Standard teaching load
+    })
+
+    # Weighted sampling without replacement via Gumbel keys: the top-k keys of each row are its subjects
+    counts = rng.choice(SPECIALIZATION_COUNTS, size=num_teachers, p=SPECIALIZATION_WEIGHTS)
+    keys = np.log(weights) + rng.gumbel(size=(num_teachers, len(SUBJECTS_LIST)))
+    ranked = np.argsort(-keys, axis=1)
+    # The first teachers lead with one subject each, so every subject has at least one teacher
+    for i in range(min(num_teachers, len(SUBJECTS_LIST))):
+        j = int(np.flatnonzero(ranked[i] == i)[0])
+        ranked[i, [0, j]] = ranked[i, [j, 0]]
+    chosen = np.arange(len(SUBJECTS_LIST)) < counts[:, None]
+    rows, ranks = np.nonzero(chosen)
+    df_specializations = pd.DataFrame({
+        "teacher_id": teacher_ids[rows],
+        "subject_name": np.array(SUBJECTS_LIST)[ranked[rows, ranks]],
+    })
+    return df_teachers, df_specializations
+
+
+def generate_offline_dataset(seed=0, scale=1.0, sections_per_grade=None, num_teachers=None, num_classrooms=None):
+    """
+    Builds all tables without an LLM. `scale` multiplies the default school (3 sections per grade,
+    120 teachers, 50 rooms); explicit counts override it. The same seed gives the same dataset.
+    Returns a dict of DataFrames in the CSV layout used by setup_database.
+    """
+    rng = np.random.default_rng(seed)
+    sections_per_grade = sections_per_grade or max(1, round(len(SECTIONS) * scale))
+    num_teachers = num_teachers or max(len(SUBJECTS_LIST), round(NUM_TEACHERS * scale))
+    num_classrooms = num_classrooms or max(len(CLASSROOM_TYPES_MAPPING), round(NUM_CLASSROOMS * scale))
+
+    df_grade_sections, df_curriculum = generate_offline_curriculum(rng, GRADES, section_names(sections_per_grade))
+    df_teachers, df_specializations = generate_offline_teachers(rng, num_teachers, df_curriculum)
+    return {
+        "teachers": df_teachers,
+        "subjects": pd.DataFrame({"subject_name": SUBJECTS_LIST}),
+        "classroom_types": pd.DataFrame({"type_name": list(CLASSROOM_TYPES_MAPPING.keys())}),
+        "classrooms": generate_classrooms(num_classrooms),
+        "grade_sections": df_grade_sections,
+        "teacher_specializations": df_specializations,
+        "curriculum": df_curriculum,
+    }
 
-        # Assign 1 to 3 specializations
-        num_specializations = random.randint(1, 3)
-        teacher_subjects = random.sample(SUBJECTS_LIST, num_specializations)
-        for subject in teacher_subjects:
-            specializations.append({
-                "teacher_id": teacher_id_counter,
-                "subject_name": subject
-            })
-        teacher_id_counter += 1
 
-    return pd.DataFrame(teachers), pd.DataFrame(specializations)
+def write_offline_database(frames, db_path):
+    """Creates the setup_database schema in db_path and fills it from generate_offline_dataset output."""
+    from database.setup_database import create_tables, populate_from_frames
 
-def generate_classrooms():
-    """Generates classrooms of different types."""
-    # Define distribution
-    num_labs = 8
-    num_pe = 4
-    num_kitchens = 2
-    num_computer_labs = 6
-    num_normal = NUM_CLASSROOMS - (num_labs + num_pe + num_kitchens + num_computer_labs)
+    conn = sqlite3.connect(db_path)
+    try:
+        create_tables(conn)
+        populate_from_frames(conn, frames)
+    finally:
+        conn.close()
 
-    room_counts = {
-        "Science Lab": num_labs,
-        "PE Area": num_pe,
-        "Nutrition Kitchen": num_kitchens,
-        "Computer Lab": num_computer_labs,
-        "Normal Classroom": num_normal
-    }
 
-    classrooms = []
-    classroom_id_counter = 1
-    for room_type, count in room_counts.items():
-        for i in range(count):
-            name = f"{room_type.replace(' ', '')}-{i+1}"
-            capacity = 30 # Assume standard capacity
-            if room_type == "PE Area":
-                capacity = 60
-            classrooms.append({
-                "classroom_id": classroom_id_counter,
-                "classroom_name": name,
-                "type_name": room_type,
-                "capacity": capacity
-            })
-            classroom_id_counter += 1
-    return pd.DataFrame(classrooms)
+def main_offline(args):
+    started = time.time()
+    frames = generate_offline_dataset(args.seed, args.scale, args.sections_per_grade, args.teachers, args.classrooms)
+    write_offline_database(frames, args.db)
+    print(f"Offline dataset (seed {args.seed}): {len(frames['grade_sections'])} sections, {len(frames['teachers'])} teachers, "
+          f"{len(frames['classrooms'])} rooms, {int(frames['curriculum']['weekly_hours'].sum())} weekly class hours.")
+    print(f"Database '{args.db}' written in {time.time() - started:.1f}s.")
 
-def generate_curriculum():
-    """Generates curriculum requirements for each grade-section."""
-    # Create grade-sections first
-    grade_sections = []
-    section_id_counter = 1
-    for grade in GRADES:
-        for section in SECTIONS:
-            grade_sections.append({
-                "section_id": section_id_counter,
-                "grade": grade,
-                "section_name": section
-            })
-            section_id_counter += 1
-    df_grade_sections = pd.DataFrame(grade_sections)
 
-    # Generate curriculum for each grade
-    curriculum_data = []
-    for grade in GRADES:
-        prompt = f"""
-        Create a standard weekly curriculum for Grade {grade}.
-        The curriculum must include subjects, and the number of hours per week for each subject.
-        The total weekly hours should be between 30 and 35.
-        Use subjects from this list: {SUBJECTS_LIST}.
-        Ensure the subjects are appropriate for Grade {grade}. For example, younger grades might not have Physics.
-        Format the output as a JSON object where keys are subject names and values are weekly hours.
-        Example for a grade: {{"Mathematics": 5, "English": 5, "Science": 4, "History": 3, "PE": 2}}
-        """
-        curriculum_json_str = generate_data_with_llm(prompt, temperature=0.5)
-        # Clean up potential markdown formatting from LLM response
-        curriculum_json_str = curriculum_json_str.strip().replace('```json', '').replace('```', '').strip()
-        grade_curriculum = json.loads(curriculum_json_str)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate the school dataset (LLM-backed CSVs, or an offline database).")
+    parser.add_argument("--offline", action="store_true", help="Generate without an LLM and write the database directly.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the offline generator.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Size multiplier of the offline school (10 = 30 sections per grade).")
+    parser.add_argument("--sections-per-grade", type=int, help="Override the number of sections per grade.")
+    parser.add_argument("--teachers", type=int, help="Override the number of teachers.")
+    parser.add_argument("--classrooms", type=int, help="Override the number of classrooms.")
+    parser.add_argument("--db", default="school_planner.db", help="Database file written in offline mode.")
+    return parser.parse_args()
 
-        # Apply this curriculum to all sections of the grade
-        sections_for_grade = df_grade_sections[df_grade_sections['grade'] == grade]
-        for _, row in sections_for_grade.iterrows():
-            for subject, hours in grade_curriculum.items():
-                 # Find the required room type
-                required_room_type = "Normal Classroom" # Default
-                for room_type, subjects_in_type in CLASSROOM_TYPES_MAPPING.items():
-                    if subject in subjects_in_type:
-                        required_room_type = room_type
-                        break
-                curriculum_data.append({
-                    "section_id": row['section_id'],
-                    "subject_name": subject,
-                    "weekly_hours": hours,
-                    "required_classroom_type": required_room_type
-                })
 
-    df_curriculum = pd.DataFrame(curriculum_data)
-    return df_grade_sections, df_curriculum
 def main():
     """Main function to generate all data and save to CSVs."""
     
@@ -381,4 +432,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.offline:
+        main_offline(args)
+    else:
+        main()
\ No newline at end of file
@@ -1,11 +1,21 @@
+import os
 import sqlite3
+import sys
 import pandas as pd
 
+# Lets `python database/setup_database.py` import the ai package from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai.schedule_store import ensure_schedule_tables
+
 DB_NAME = "school_planner.db"
 
 def create_tables(conn):
     """Creates all necessary tables based on the schema."""
     cursor = conn.cursor()
+    # Schedules are versioned (ai/schedule_store.py); `schedule` is a view in new databases and a table in old ones
+    for name, kind in cursor.execute(
+            "SELECT name, type FROM sqlite_master WHERE name IN ('schedule', 'schedule_entries', 'schedule_versions')").fetchall():
+        cursor.execute(f"DROP {kind.upper()} {name}")
     cursor.executescript("""
         DROP TABLE IF EXISTS teachers;
         CREATE TABLE teachers (
@@ -64,35 +74,34 @@ def create_tables(conn):
             FOREIGN KEY (subject_id) REFERENCES subjects(subject_id),
             FOREIGN KEY (required_classroom_type_id) REFERENCES classroom_types(type_id)
         );
-
-        DROP TABLE IF EXISTS schedule;
-        CREATE TABLE schedule (
-            schedule_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            section_id INTEGER,
-            teacher_id INTEGER,
-            subject_id INTEGER,
-            classroom_id INTEGER,
-            day_of_week INTEGER,
-            time_slot INTEGER,
-            FOREIGN KEY (section_id) REFERENCES grade_sections(section_id),
-            FOREIGN KEY (teacher_id) REFERENCES teachers(teacher_id),
-            FOREIGN KEY (subject_id) REFERENCES subjects(subject_id),
-            FOREIGN KEY (classroom_id) REFERENCES classrooms(classroom_id)
-        );
     """)
     conn.commit()
+    ensure_schedule_tables(conn)
     print("Tables created successfully.")
 
 def populate_tables(conn):
     """Populates tables from the generated CSV files."""
     # Load base data
-    df_teachers = pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/teachers.csv")
-    df_subjects = pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/subjects.csv")
-    df_classroom_types = pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/classroom_types.csv")
-    df_classrooms = pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/classrooms.csv")
-    df_grade_sections = pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/grade_sections.csv")
-    df_specializations = pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/teacher_specializations.csv")
-    df_curriculum = pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/curriculum.csv")
+    frames = {
+        "teachers": pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/teachers.csv"),
+        "subjects": pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/subjects.csv"),
+        "classroom_types": pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/classroom_types.csv"),
+        "classrooms": pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/classrooms.csv"),
+        "grade_sections": pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/grade_sections.csv"),
+        "teacher_specializations": pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/teacher_specializations.csv"),
+        "curriculum": pd.read_csv("/home/salman/Desktop/Projects/school-resource-planner/curriculum.csv"),
+    }
+    populate_from_frames(conn, frames)
+
+def populate_from_frames(conn, frames):
+    """Populates tables from DataFrames in the layout of the generated CSV files (keyed by CSV name)."""
+    df_teachers = frames["teachers"]
+    df_subjects = frames["subjects"]
+    df_classroom_types = frames["classroom_types"]
+    df_classrooms = frames["classrooms"].copy()
+    df_grade_sections = frames["grade_sections"]
+    df_specializations = frames["teacher_specializations"].copy()
+    df_curriculum = frames["curriculum"].copy()
 
     # Insert data into tables
     df_teachers.to_sql("teachers", conn, if_exists="append", index=False)
@@ -1,73 +1,73 @@
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Form, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import sqlite3
-import pandas as pd
 import time
-import plotly.express as px
+import asyncio
+import contextlib
 import collections
+import threading
+import json
+import gzip
+import traceback
 
-# Import the new, powerful GA solver
-from ai.utils import load_data, format_solution, save_schedule_to_db
-from ai.genetic_solver import solve_with_ga
-from ai.utils import TIME_SLOTS_PER_DAY, DAYS_OF_WEEK
+# Solves run as background jobs in separate processes (see ai/jobs.py)
+from ai.jobs import JobDispatcher, DISPATCH_INTERVAL, FINISHED_STATUSES, submit_job, get_job, get_result_summary, get_progress, cancel_job
+from ai.utils import DB_NAME, TIME_SLOTS_PER_DAY, DAYS_OF_WEEK, get_schedule_conflicts, build_timetable_grids
+from ai.schedule_store import ENTITY_KINDS, list_entities, load_entity_timetable, load_schedule_version
+from ai.reference_cache import cached_analysis_tables, cached_name_maps, schedule_cache_key
 
-app = FastAPI()
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+# Live progress stream: seconds between polls of the progress table (each poll sends at most one batch),
+# and between keep-alive comments while nothing changes
+PROGRESS_POLL_INTERVAL = 1.0
+PROGRESS_KEEPALIVE_INTERVAL = 15.0
+# Analysis results and timetable grids memoized per (schedule version, reference data version);
+# schedule versions never change once written
+VERSION_CACHE_SIZE = 16
+# JSON responses at least this large are gzipped for clients that accept it
+GZIP_MIN_SIZE = 500
 
-def get_schedule_conflicts(schedule_df):
-    """Detects and returns a list of conflicts from a generated schedule."""
-    if schedule_df is None: return []
-    
-    conflicts = []
-    teacher_slots = collections.defaultdict(list)
-    room_slots = collections.defaultdict(list)
-    section_slots = collections.defaultdict(list)
-
-    # Group classes by timeslot
-    for _, row in schedule_df.iterrows():
-        teacher_key = (row['teacher_id'], row['day_of_week'], row['time_slot'])
-        room_key = (row['classroom_id'], row['day_of_week'], row['time_slot'])
-        section_key = (row['section_id'], row['day_of_week'], row['time_slot'])
-        
-        class_info = f"{row['subject_name']} for {row['section_full_name']}"
-        teacher_slots[teacher_key].append(class_info)
-        room_slots[room_key].append(f"Room {row['classroom_name']}")
-        section_slots[section_key].append(f"Section {row['section_full_name']}")
-
-    # Check for slots used more than once
-    for key, classes in teacher_slots.items():
-        if len(classes) > 1:
-            conflicts.append(f"Teacher Conflict: Day {key[1]}, Slot {key[2]} - Teacher is double-booked with: {'; '.join(classes)}")
-    for key, classes in room_slots.items():
-        if len(classes) > 1:
-            conflicts.append(f"Room Conflict: Day {key[1]}, Slot {key[2]} - Room is double-booked.")
-    for key, classes in section_slots.items():
-        if len(classes) > 1:
-            conflicts.append(f"Section Conflict: Day {key[1]}, Slot {key[2]} - Section has overlapping classes.")
-            
-    return conflicts
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Runs the job dispatcher for the lifetime of the app, so queued solves start in the background."""
+    dispatcher = JobDispatcher()
+
+    async def dispatch_loop():
+        while True:
+            try:
+                await asyncio.to_thread(dispatcher.tick)
+            except Exception:
+                # A locked database or a process that failed to start must not end the loop, or queued
+                # jobs would never start until a restart; the next tick retries
+                print(f"Job dispatcher tick failed:\n{traceback.format_exc()}")
+            await asyncio.sleep(DISPATCH_INTERVAL)
+
+    task = asyncio.create_task(dispatch_loop())
+    try:
+        yield
+    finally:
+        task.cancel()
+        dispatcher.shutdown()
 
 
+app = FastAPI(lifespan=lifespan)
+app.mount("/static", StaticFiles(directory="static"), name="static")
+templates = Jinja2Templates(directory="templates")
+
 def get_analysis_data(schedule_df):
     """
-    Calculates all necessary KPIs, chart data, and resource insights
-    from a generated schedule DataFrame.
+    Calculates all necessary KPIs, chart specs, and resource insights
+    from a generated schedule DataFrame. Charts are compact Plotly JSON specs
+    ({"data": [...], "layout": {...}}) that the page renders client-side.
     """
     if schedule_df is None or schedule_df.empty:
         return {}
 
     # --- Step 1: Load Base Data for Analysis ---
-    with sqlite3.connect("school_planner.db") as conn:
-        teachers_df = pd.read_sql("SELECT teacher_id, teacher_name, max_weekly_hours FROM teachers", conn)
-        # Load classrooms with their type names directly using a JOIN
-        classrooms_df = pd.read_sql("""
-            SELECT c.classroom_id, c.classroom_name, ct.type_name 
-            FROM classrooms c 
-            JOIN classroom_types ct ON c.type_id = ct.type_id
-        """, conn)
+    # Teachers with their hour limits and classrooms with their type names, cached until the data is edited
+    teachers_df, classrooms_df = cached_analysis_tables()
 
     # --- Step 2: Teacher Utilization Analysis ---
     # Count how many hours each teacher is scheduled
@@ -89,103 +89,322 @@ def get_analysis_data(schedule_df):
 
     # --- Step 4: Prepare Data for the UI ---
     # Identify high and low demand rooms
-    high_demand_rooms = classroom_util[classroom_util['utilization_pct'] > 85].to_dict('records')
-    low_demand_rooms = classroom_util[classroom_util['utilization_pct'] < 25].to_dict('records')
-
-    # Create charts using Plotly
-    fig_teacher_workload = px.histogram(
-        teacher_util, 
-        x='scheduled_hours', 
-        title='Teacher Workload Distribution',
-        labels={'scheduled_hours': 'Weekly Hours Scheduled', 'count': 'Number of Teachers'}
-    )
+    def room_records(rooms):
+        return [{"classroom_name": name, "utilization_pct": float(pct)}
+                for name, pct in zip(rooms['classroom_name'], rooms['utilization_pct'])]
+    high_demand_rooms = room_records(classroom_util[classroom_util['utilization_pct'] > 85])
+    low_demand_rooms = room_records(classroom_util[classroom_util['utilization_pct'] < 25])
+
+    # Chart specs for Plotly.js: only the plotted values, no template or HTML
+    teacher_workload_chart = {
+        "data": [{"type": "histogram", "x": teacher_util['scheduled_hours'].astype(int).tolist()}],
+        "layout": {
+            "title": {"text": "Teacher Workload Distribution"},
+            "xaxis": {"title": {"text": "Weekly Hours Scheduled"}},
+            "yaxis": {"title": {"text": "Number of Teachers"}},
+        },
+    }
     
-    avg_util_by_type = classroom_util.groupby('type_name')['utilization_pct'].mean().round(1).reset_index()
-    fig_room_util = px.bar(
-        avg_util_by_type, 
-        x='type_name', 
-        y='utilization_pct', 
-        title='Average Utilization by Room Type', 
-        color='type_name',
-        labels={'type_name': 'Room Type', 'utilization_pct': 'Average Utilization (%)'}
-    )
+    avg_util_by_type = classroom_util.groupby('type_name')['utilization_pct'].mean().round(1)
+    room_util_chart = {
+        # One trace per room type, so every type gets its own color and legend entry
+        "data": [{"type": "bar", "name": type_name, "x": [type_name], "y": [float(pct)]}
+                 for type_name, pct in avg_util_by_type.items()],
+        "layout": {
+            "title": {"text": "Average Utilization by Room Type"},
+            "xaxis": {"title": {"text": "Room Type"}},
+            "yaxis": {"title": {"text": "Average Utilization (%)"}},
+        },
+    }
     
     # --- Step 5: Return a Dictionary with All Results ---
     return {
         "kpi_total_classes": len(schedule_df),
-        "kpi_active_teachers": schedule_df['teacher_id'].nunique(),
-        "kpi_utilized_rooms": schedule_df['classroom_id'].nunique(),
-        "teacher_workload_chart": fig_teacher_workload.to_html(full_html=False, include_plotlyjs='cdn'),
-        "room_util_chart": fig_room_util.to_html(full_html=False, include_plotlyjs='cdn'),
+        "kpi_active_teachers": int(schedule_df['teacher_id'].nunique()),
+        "kpi_utilized_rooms": int(schedule_df['classroom_id'].nunique()),
+        "teacher_workload_chart": teacher_workload_chart,
+        "room_util_chart": room_util_chart,
         "high_demand_rooms": high_demand_rooms,
         "low_demand_rooms": low_demand_rooms,
     }
 
 
+_version_cache = collections.OrderedDict()
+_version_cache_lock = threading.Lock()
+
+
+def _memoized(name, key, compute):
+    """compute() for a schedule cache key, computed on first request and kept for the last VERSION_CACHE_SIZE keys."""
+    with _version_cache_lock:
+        if (name, key) in _version_cache:
+            _version_cache.move_to_end((name, key))
+            return _version_cache[(name, key)]
+    value = compute()
+    with _version_cache_lock:
+        _version_cache[(name, key)] = value
+        while len(_version_cache) > VERSION_CACHE_SIZE:
+            _version_cache.popitem(last=False)
+    return value
+
+
+def _load_version(version):
+    with sqlite3.connect(DB_NAME, timeout=30) as conn:
+        return load_schedule_version(conn, version)
+
+
+def _compute_analysis(version):
+    analysis = get_analysis_data(_load_version(version))
+    if analysis:
+        analysis["version"] = version
+    return analysis or None
+
+
+def cached_analysis(version=None):
+    """get_analysis_data for a schedule version (the current one by default), or None if there is no such schedule."""
+    key = schedule_cache_key(version)
+    if key is None:
+        return None
+    return _memoized("analysis", key, lambda: _compute_analysis(key[0]))
+
+
+def cached_timetable_grids(key):
+    """build_timetable_grids for the schedule of a cache key: every entity's grid, built once per version."""
+    return _memoized("grids", key, lambda: build_timetable_grids(_load_version(key[0]), cached_name_maps()))
+
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     """Serves the main page."""
     return templates.TemplateResponse("index.html", {"request": request})
 
 
-@app.post("/", response_class=HTMLResponse)
-async def generate_schedule(request: Request, dummy_form_input: str = Form(None)):
-    """Handles the form submission, runs the GA, and returns the page with results."""
-    # The rest of the function remains exactly the same.
-    log_messages = []
-    def logger(message):
-        print(message)
-        log_messages.append(message)
-
-    conn = sqlite3.connect("school_planner.db")
-    teachers_df, classrooms_df, curriculum_df = load_data(conn)
+def build_results_context(schedule_df):
+    """
+    Builds the template context (timetable choices, conflicts) for a schedule. The analysis dashboard
+    and the timetable grids are not computed here; the page fetches them for its schedule version.
+    """
+    # Create the full DataFrame for display
+    teachers_map, subjects_map, classrooms_map, sections_map = cached_name_maps()
     
-    logger("--- Running Advanced Genetic Algorithm ---")
-    solution = solve_with_ga(teachers_df, classrooms_df, curriculum_df)
-
-    full_schedule_df = None
-    analysis_data = {}
-    conflicts = []
-    if solution:
-        schedule_df = format_solution(solution)
-        save_schedule_to_db(conn, schedule_df)
-        
-        # Create the full DataFrame for display
-        # ... (same data mapping logic as before) ...
-        # (This block for creating full_schedule_df is the same)
-        with sqlite3.connect("school_planner.db") as conn_display:
-            teachers_map = pd.read_sql("SELECT teacher_id, teacher_name FROM teachers", conn_display).set_index('teacher_id')
-            subjects_map = pd.read_sql("SELECT subject_id, subject_name FROM subjects", conn_display).set_index('subject_id')
-            classrooms_map = pd.read_sql("SELECT classroom_id, classroom_name FROM classrooms", conn_display).set_index('classroom_id')
-            sections_map = pd.read_sql("SELECT section_id, 'Grade ' || grade || '-' || section_name as name FROM grade_sections", conn_display).set_index('section_id')
-        
-        full_schedule_df = schedule_df.copy()
-        full_schedule_df['teacher_name'] = full_schedule_df['teacher_id'].map(teachers_map['teacher_name'])
-        full_schedule_df['subject_name'] = full_schedule_df['subject_id'].map(subjects_map['subject_name'])
-        full_schedule_df['classroom_name'] = full_schedule_df['classroom_id'].map(classrooms_map['classroom_name'])
-        full_schedule_df['section_full_name'] = full_schedule_df['section_id'].map(sections_map['name'])
-        
-        analysis_data = get_analysis_data(full_schedule_df)
-        conflicts = get_schedule_conflicts(full_schedule_df) # Get conflicts
-    else:
-        logger("GA failed to find a solution.")
-
-    conn.close()
-
-    # Pass everything back to the template
-    teachers_list, sections_list, classrooms_list = [], [], []
-    if full_schedule_df is not None:
-        teachers_list = sorted(full_schedule_df['teacher_name'].unique())
-        sections_list = sorted(full_schedule_df['section_full_name'].unique())
-        classrooms_list = sorted(full_schedule_df['classroom_name'].unique())
-        
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "teachers": teachers_list,
-        "sections": sections_list,
-        "classrooms": classrooms_list,
-        "schedule": full_schedule_df.to_dict('records') if full_schedule_df is not None else None,
-        "analysis": analysis_data,
-        "logs": "\n".join(log_messages),
+    full_schedule_df = schedule_df.copy()
+    full_schedule_df['teacher_name'] = full_schedule_df['teacher_id'].map(teachers_map['teacher_name'])
+    full_schedule_df['subject_name'] = full_schedule_df['subject_id'].map(subjects_map['subject_name'])
+    full_schedule_df['classroom_name'] = full_schedule_df['classroom_id'].map(classrooms_map['classroom_name'])
+    full_schedule_df['section_full_name'] = full_schedule_df['section_id'].map(sections_map['section_full_name'])
+    
+    conflicts = get_schedule_conflicts(full_schedule_df) # Get conflicts
+
+    def scheduled(id_column, name_column):
+        """Ids and names of the entities that have classes, ordered by name, for the timetable dropdowns."""
+        entities = full_schedule_df[[id_column, name_column]].drop_duplicates(id_column).sort_values(name_column)
+        return [{"id": int(entity_id), "name": name} for entity_id, name in zip(entities[id_column], entities[name_column])]
+
+    # The page fetches one timetable grid at a time from /api/timetables/{kind}/{id}/grid instead of the schedule rows
+    return {
+        "teachers": scheduled('teacher_id', 'teacher_name'),
+        "sections": scheduled('section_id', 'section_full_name'),
+        "classrooms": scheduled('classroom_id', 'classroom_name'),
+        "has_schedule": True,
         "conflicts": conflicts
-    })
\ No newline at end of file
+    }
+
+
+def job_results_context(summary):
+    """
+    Template context of a finished job from get_result_summary: the results of its saved schedule version,
+    built once per version (shared by every view of every job that produced it), plus the job's logs.
+    """
+    key = None
+    if summary['has_schedule']:
+        # Jobs finished before versions were recorded show the current schedule
+        key = schedule_cache_key(summary['version'])
+    if key is None:
+        results = {"teachers": [], "sections": [], "classrooms": [], "has_schedule": False, "conflicts": []}
+    else:
+        results = _memoized("results", key, lambda: build_results_context(_load_version(key[0])))
+    return {**results, "schedule_version": key[0] if key else None, "logs": "\n".join(summary['logs'])}
+
+
+@app.post("/", response_class=HTMLResponse)
+async def generate_schedule(request: Request, dummy_form_input: str = Form(None), force_refresh: bool = Form(False),
+                            warm_start: bool = Form(False)):
+    """Handles the form submission: queues a solve job and redirects to its page, which polls for the result."""
+    job_id = await asyncio.to_thread(submit_job, {"force": force_refresh, "warm_start": warm_start})
+    return RedirectResponse(f"/jobs/{job_id}", status_code=303)
+
+
+@app.get("/jobs/{job_id}", response_class=HTMLResponse)
+async def job_page(request: Request, job_id: str):
+    """Shows a queued/running job (the page polls its status) or the results of a finished one."""
+    job = await asyncio.to_thread(get_job, job_id, with_result=False)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+
+    context = {"request": request, "job": {k: job[k] for k in ("job_id", "status", "error", "queue_position")}}
+    if job['status'] == 'done':
+        summary = await asyncio.to_thread(get_result_summary, job_id)
+        context.update(await asyncio.to_thread(job_results_context, summary))
+    return templates.TemplateResponse("index.html", context)
+
+
+@app.post("/api/jobs")
+async def create_job(force: bool = False, warm_start: bool = False):
+    """
+    Queues a solve and returns its id right away. Unchanged inputs are answered from the solution cache
+    unless force is set; warm_start re-plans only what changed since the current schedule.
+    """
+    job_id = await asyncio.to_thread(submit_job, {"force": force, "warm_start": warm_start})
+    job = await asyncio.to_thread(get_job, job_id, with_result=False)
+    return {"job_id": job_id, "status": job['status']}
+
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Job status without the (potentially large) result payload."""
+    job = await asyncio.to_thread(get_job, job_id, with_result=False)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+
+@app.get("/api/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """The generated schedule rows and solver logs of a finished job."""
+    job = await asyncio.to_thread(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if job['status'] != 'done':
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job['result']
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job_endpoint(job_id: str):
+    """Cancels a queued job, or asks a running one to stop; the current timetable is left untouched."""
+    status = await asyncio.to_thread(cancel_job, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return {"job_id": job_id, "status": status}
+
+
+def _sse(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@app.get("/api/jobs/{job_id}/progress")
+async def job_progress(request: Request, job_id: str):
+    """
+    Server-Sent Events stream of a job's per-generation stats. Every poll sends the new generations
+    as one batch (a JSON list), status changes as 'status' events, and an 'end' event once the job
+    has finished. Reconnecting clients resume after the Last-Event-ID generation.
+    """
+    job = await asyncio.to_thread(get_job, job_id, with_result=False)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    last_event_id = request.headers.get("last-event-id", "")
+    after = int(last_event_id) if last_event_id.lstrip("-").isdigit() else -1
+
+    async def events():
+        nonlocal after
+        status, last_sent = None, time.monotonic()
+        while not await request.is_disconnected():
+            job = await asyncio.to_thread(get_job, job_id, with_result=False)
+            records = await asyncio.to_thread(get_progress, job_id, after)
+            if records:
+                after = records[-1]['gen']
+                yield _sse(records, event_id=after)
+                last_sent = time.monotonic()
+            if job['status'] != status:
+                status = job['status']
+                yield _sse({"status": status, "queue_position": job['queue_position']}, event="status")
+                last_sent = time.monotonic()
+            if status in FINISHED_STATUSES:
+                yield _sse({"status": status}, event="end")
+                return
+            if time.monotonic() - last_sent >= PROGRESS_KEEPALIVE_INTERVAL:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _check_entity_kind(kind):
+    if kind not in ENTITY_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown timetable kind '{kind}', expected one of {list(ENTITY_KINDS)}")
+
+
+def _entities(kind):
+    with sqlite3.connect(DB_NAME) as conn:
+        return [{"id": entity_id, "name": name} for entity_id, name in list_entities(conn, kind)]
+
+
+def _json_response(request, payload, headers):
+    """Compact JSON, gzipped when the client accepts it and the body is worth compressing."""
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    headers = {**headers, "Vary": "Accept-Encoding"}
+    if len(body) >= GZIP_MIN_SIZE and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _entity_timetable(kind, entity_id):
+    with sqlite3.connect(DB_NAME) as conn:
+        return load_entity_timetable(conn, kind, entity_id)
+
+
+@app.get("/api/timetables/{kind}")
+async def timetable_entities(kind: str):
+    """Ids and names of all teachers, classrooms or sections (kind: teacher, classroom or section)."""
+    _check_entity_kind(kind)
+    return await asyncio.to_thread(_entities, kind)
+
+
+@app.get("/api/timetables/{kind}/{entity_id}")
+async def entity_timetable(kind: str, entity_id: int):
+    """One teacher's, classroom's or section's week in the current schedule, read through the per-entity indexes."""
+    _check_entity_kind(kind)
+    timetable = await asyncio.to_thread(_entity_timetable, kind, entity_id)
+    if timetable is None:
+        raise HTTPException(status_code=404, detail=f"Unknown {kind} {entity_id}")
+    return timetable
+
+
+@app.get("/api/analysis")
+@app.get("/api/analysis/{version}")
+async def analysis(version: int = None):
+    """KPIs, resource insights and chart specs of a schedule version (default: the current schedule)."""
+    data = await asyncio.to_thread(cached_analysis, version)
+    if data is None:
+        raise HTTPException(status_code=404, detail="No such schedule")
+    return data
+
+
+@app.get("/api/timetables/{kind}/{entity_id}/grid")
+async def entity_timetable_grid(request: Request, kind: str, entity_id: int, version: int = None):
+    """
+    One teacher's, classroom's or section's week as a TIME_SLOTS_PER_DAY x days grid of display lines (see
+    build_timetable_grids), for a schedule version (default: the current one). All grids of a version are
+    built on the first request; the ETag lets browsers revalidate without downloading the grid again.
+    """
+    _check_entity_kind(kind)
+    key = await asyncio.to_thread(schedule_cache_key, version)
+    if key is None:
+        raise HTTPException(status_code=404, detail="No such schedule")
+    schedule_version, (token, reference_version) = key
+    headers = {"ETag": f'W/"{schedule_version}-{token}-{reference_version}"', "Cache-Control": "no-cache"}
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    grids = await asyncio.to_thread(cached_timetable_grids, key)
+    entity = grids[kind].get(entity_id)
+    if entity is None:
+        raise HTTPException(status_code=404, detail=f"Unknown {kind} {entity_id}")
+    return _json_response(request, {"kind": kind, "id": entity_id, "version": schedule_version, **entity}, headers)